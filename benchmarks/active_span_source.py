@@ -0,0 +1,190 @@
+"""Micro-benchmarks for all the ActiveSpanSource implementations. Each
+source is measured in the execution model it's meant for (threads,
+asyncio tasks, greenlets or Tornado coroutines), with a number of
+already active spans (`depth`) and of concurrent workers (`concurrency`).
+
+For each combination the benchmark reports the nanoseconds spent for a
+single `make_active()`, `active_span`, `deactivate()` and for a full
+`start_active_span()` plus `finish()` cycle. The `loop` value is the
+cost of an empty iteration, while the `baseline` source is the proposal
+`Tracer` that doesn't trace anything.
+
+Threads are measured with their own CPU time, so that the time spent
+waiting for the GIL is not included.
+"""
+import time
+import asyncio
+import functools
+import threading
+import contextlib
+
+import gevent
+from tornado import gen
+from tornado.ioloop import IOLoop
+from basictracer.tracer import NoopRecorder
+
+from proposal import Tracer
+from proposal.active_span_source import NoopActiveSpanSource
+from ext.span import NonRecordingSpan
+from ext.tracer import DebugTracer
+from ext.active_span_source import (
+    AsyncioActiveSpanSource,
+    ContextVarActiveSpanSource,
+    ThreadActiveSpanSource,
+    GeventActiveSpanSource,
+    TornadoActiveSpanSource,
+    TornadoContextVarActiveSpanSource,
+    TracerStackContext,
+)
+
+
+OPERATIONS = ('loop', 'make_active', 'active_span', 'deactivate', 'cycle')
+
+
+def measure(tracer, iterations, depth, scope=None, timer=time.perf_counter):
+    """Measures all the operations of the `tracer` ActiveSpanSource in
+    the current execution context, after `depth` spans are activated.
+    If a `scope` is given, it's entered once and before each parent
+    `Span` is activated. Returns the elapsed seconds per operation.
+    """
+    source = tracer.active_span_source
+    spans = [NonRecordingSpan(tracer, None) for _ in range(iterations)]
+    results = {}
+
+    with contextlib.ExitStack() as stack:
+        if scope is not None:
+            stack.enter_context(scope())
+
+        for _ in range(depth):
+            if scope is not None:
+                stack.enter_context(scope())
+            stack.callback(tracer.start_active_span('parent').finish)
+
+        start = timer()
+        for span in spans:
+            pass
+        results['loop'] = timer() - start
+
+        start = timer()
+        for span in spans:
+            source.make_active(span)
+        results['make_active'] = timer() - start
+
+        start = timer()
+        for span in spans:
+            source.active_span
+        results['active_span'] = timer() - start
+
+        start = timer()
+        for span in reversed(spans):
+            source.deactivate(span)
+        results['deactivate'] = timer() - start
+
+        start = timer()
+        for span in spans:
+            tracer.start_active_span('span').finish()
+        results['cycle'] = timer() - start
+
+    return results
+
+
+def run_threads(tracer, iterations, depth, concurrency):
+    results = []
+    barrier = threading.Barrier(concurrency)
+
+    def worker():
+        barrier.wait()
+        results.append(measure(tracer, iterations, depth, timer=time.thread_time))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_tasks(tracer, iterations, depth, concurrency):
+    async def worker():
+        # let all the workers start before measuring
+        await asyncio.sleep(0)
+        return measure(tracer, iterations, depth)
+
+    async def run():
+        return await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(run())
+
+
+def run_greenlets(tracer, iterations, depth, concurrency):
+    def worker():
+        # let all the workers start before measuring
+        gevent.sleep(0)
+        return measure(tracer, iterations, depth)
+
+    greenlets = [gevent.spawn(worker) for _ in range(concurrency)]
+    gevent.joinall(greenlets)
+    return [g.value for g in greenlets]
+
+
+def run_coroutines(tracer, iterations, depth, concurrency, scope=TracerStackContext):
+    @gen.coroutine
+    def worker():
+        # let all the workers start before measuring
+        yield gen.moment
+        return measure(tracer, iterations, depth, scope=scope)
+
+    @gen.coroutine
+    def run():
+        results = yield [worker() for _ in range(concurrency)]
+        return results
+
+    return IOLoop.current().run_sync(run)
+
+
+def make_tracer(source):
+    tracer = DebugTracer(recorder=NoopRecorder())
+    tracer._active_span_source = source
+    return tracer
+
+
+# (name, tracer factory, runner)
+SOURCES = [
+    ('baseline', Tracer, run_threads),
+    ('noop', lambda: make_tracer(NoopActiveSpanSource()), run_threads),
+    ('thread', lambda: make_tracer(ThreadActiveSpanSource()), run_threads),
+    ('asyncio', lambda: make_tracer(AsyncioActiveSpanSource()), run_tasks),
+    ('contextvars', lambda: make_tracer(ContextVarActiveSpanSource()), run_tasks),
+    ('gevent', lambda: make_tracer(GeventActiveSpanSource()), run_greenlets),
+    ('tornado', lambda: make_tracer(TornadoActiveSpanSource()), run_coroutines),
+    ('tornado-contextvars', lambda: make_tracer(TornadoContextVarActiveSpanSource()),
+     functools.partial(run_coroutines, scope=None)),
+]
+
+
+def run(sources=None, iterations=1000, depths=(0, 1, 10, 50), concurrency=(1, 10, 100)):
+    """Runs the benchmark for each combination of source, depth and
+    concurrency. Returns a list of results with the nanoseconds spent
+    for each operation, averaged between workers.
+    """
+    results = []
+    for name, factory, runner in SOURCES:
+        if sources and name not in sources:
+            continue
+
+        try:
+            factory()
+        except RuntimeError:
+            # not available with this Python or Tornado version
+            continue
+
+        for depth in depths:
+            for workers in concurrency:
+                measures = runner(factory(), iterations, depth, workers)
+                result = {'source': name, 'depth': depth, 'concurrency': workers}
+                for operation in OPERATIONS:
+                    elapsed = sum(m[operation] for m in measures) / len(measures)
+                    result[operation] = round(elapsed / iterations * 1e9, 1)
+                results.append(result)
+    return results
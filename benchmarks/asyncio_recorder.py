@@ -0,0 +1,103 @@
+"""Benchmarks the event loop latency of the `examples.server` workload
+when finished spans are written synchronously, like the `LogRecorder`
+does, or by the `AsyncioRecorder`. A probe Task sleeps for 1ms in a
+loop and measures how late it's resumed. The collector used by the
+socket variant runs in a thread of the same process.
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+from basictracer.tracer import NoopRecorder
+
+from ext.collector import Collector
+from ext.recorder import format_span
+from ext.asyncio_recorder import AsyncioRecorder
+from ext.active_span_source import ContextVarActiveSpanSource
+
+from examples import server
+from .server import fast_server, traced_with
+
+
+PROBE_INTERVAL = 0.001
+
+
+class FileRecorder(object):
+    """Recorder that writes each `Span` in a file as soon as it's
+    finished, blocking the event loop"""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def record_span(self, span):
+        self.stream.write(format_span(span) + '\n')
+        self.stream.flush()
+
+
+async def probe(lags):
+    loop = asyncio.get_event_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(loop.time() - start - PROBE_INTERVAL)
+
+
+async def run_requests(recorder, requests, concurrency):
+    """Executes `requests` `handle_request()` calls, `concurrency` at a
+    time, while the probe is running. Returns the elapsed seconds and
+    the probe lags.
+    """
+    loop = asyncio.get_event_loop()
+    lags = []
+    probe_task = loop.create_task(probe(lags))
+    if isinstance(recorder, AsyncioRecorder):
+        recorder.start()
+
+    start = time.perf_counter()
+    for _ in range(requests // concurrency):
+        await asyncio.gather(*[server.handle_request() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    probe_task.cancel()
+    if isinstance(recorder, AsyncioRecorder):
+        await recorder.close()
+    return elapsed, sorted(lags)
+
+
+def main(requests=5000, concurrency=50):
+    directory = tempfile.mkdtemp()
+    collector = Collector(os.path.join(directory, 'collector.sock'), recorder=NoopRecorder())
+    collector.start()
+
+    with open(os.path.join(directory, 'sync.log'), 'w') as sync_file, \
+            open(os.path.join(directory, 'async.log'), 'w') as async_file:
+        recorders = [
+            ('noop', lambda: NoopRecorder()),
+            ('sync file', lambda: FileRecorder(sync_file)),
+            ('asyncio file', lambda: AsyncioRecorder(stream=async_file, flush_interval=0.1)),
+            ('asyncio socket', lambda: AsyncioRecorder(address=collector.address, flush_interval=0.1)),
+        ]
+
+        print('%-16s %12s %12s %12s %12s' % ('recorder', 'req/s', 'p50 lag ms', 'p99 lag ms', 'max lag ms'))
+        with fast_server():
+            for name, make_recorder in recorders:
+                recorder = make_recorder()
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                with traced_with(ContextVarActiveSpanSource(), recorder):
+                    elapsed, lags = loop.run_until_complete(run_requests(recorder, requests, concurrency))
+                loop.close()
+
+                print('%-16s %12.0f %12.3f %12.3f %12.3f' % (
+                    name,
+                    requests / elapsed,
+                    lags[len(lags) // 2] * 1e3,
+                    lags[int(len(lags) * 0.99)] * 1e3,
+                    lags[-1] * 1e3,
+                ))
+
+    collector.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Stress test for asyncio ActiveSpanSource implementations when each
+thread runs its own event loop. Every loop runs many concurrent tasks
+that open a request span with nested children, and plain callbacks
+that use the thread local fallback. Reports the throughput and the
+number of spans with a wrong parent, that must always be zero.
+"""
+import time
+import asyncio
+import threading
+
+from ext.tracer import DebugTracer
+from ext.active_span_source import AsyncioActiveSpanSource, ContextVarActiveSpanSource
+
+
+class ParentRecorder(object):
+    """Counts the recorded spans whose parent is not the expected one,
+    stored in the `expected_parent` tag.
+    """
+    def __init__(self):
+        self.spans = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record_span(self, span):
+        expected = span.tags.get('expected_parent')
+        with self._lock:
+            self.spans += 1
+            if expected is not None and expected != span.parent_id:
+                self.errors += 1
+
+
+async def handle_request(tracer, children):
+    root = tracer.start_active_span('web.request')
+    for _ in range(children):
+        child = tracer.start_active_span('db.query', tags={'expected_parent': root.context.span_id})
+        # switch to the other tasks while the child is active
+        await asyncio.sleep(0)
+        tracer.start_active_span('db.row', tags={'expected_parent': child.context.span_id}).finish()
+        child.finish()
+    root.finish()
+
+
+def callback(tracer):
+    # executed outside a Task, so the thread local storage is used
+    root = tracer.start_active_span('callback')
+    tracer.start_active_span('callback.child', tags={'expected_parent': root.context.span_id}).finish()
+    root.finish()
+
+
+def run_loop(tracer, barrier, tasks, children):
+    loop = asyncio.new_event_loop()
+
+    async def run():
+        for _ in range(tasks):
+            loop.call_soon(callback, tracer)
+        await asyncio.gather(*[handle_request(tracer, children) for _ in range(tasks)])
+
+    barrier.wait()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def run_threads(source, threads, tasks, children):
+    """Runs `tasks` concurrent requests with `children` spans in each of
+    the `threads` loops. Returns the elapsed seconds and the recorder.
+    """
+    recorder = ParentRecorder()
+    tracer = DebugTracer(recorder=recorder)
+    tracer._active_span_source = source
+    barrier = threading.Barrier(threads + 1)
+
+    workers = [
+        threading.Thread(target=run_loop, args=(tracer, barrier, tasks, children))
+        for _ in range(threads)
+    ]
+    for t in workers:
+        t.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, recorder
+
+
+# (name, source factory)
+SOURCES = [
+    ('asyncio', AsyncioActiveSpanSource),
+    ('contextvars', ContextVarActiveSpanSource),
+]
+
+
+def main(threads=(1, 2, 4, 8), tasks=1000, children=5):
+    print('%-12s %8s %12s %8s %8s' % ('source', 'threads', 'spans/s', 'spans', 'errors'))
+    for name, factory in SOURCES:
+        try:
+            factory()
+        except RuntimeError:
+            # not available with this Python version
+            continue
+
+        for count in threads:
+            elapsed, recorder = run_threads(factory(), count, tasks, children)
+            print('%-12s %8d %12.0f %8d %8d' % (
+                name, count, recorder.spans / elapsed, recorder.spans, recorder.errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Benchmarks the spans per second delivered to a local `Collector` by
+a `CollectorReporter`, while the `examples.server` workload is traced
+with the `ContextVarActiveSpanSource`.
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+from basictracer.tracer import NoopRecorder
+
+from ext.collector import Collector, CollectorReporter
+from ext.active_span_source import ContextVarActiveSpanSource
+from benchmarks.server import traced_with, fast_server, run_requests
+
+
+def main(requests=5000):
+    address = os.path.join(tempfile.mkdtemp(), 'spans.sock')
+    collector = Collector(address, recorder=NoopRecorder()).start()
+    reporter = CollectorReporter(address, drop_on_full=False)
+    loop = asyncio.get_event_loop()
+
+    start = time.perf_counter()
+    with fast_server(), traced_with(ContextVarActiveSpanSource(), reporter):
+        traced = run_requests(loop, requests)
+    reporter.close()
+    while collector.received_spans < reporter.flushed_spans:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    collector.stop()
+
+    print('requests:         %d' % requests)
+    print('spans:            %d' % collector.received_spans)
+    print('dropped:          %d' % reporter.dropped_spans)
+    print('traced spans/s:   %.0f' % (reporter.flushed_spans / traced))
+    print('received spans/s: %.0f' % (collector.received_spans / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmarks the encoding of finished spans with the `SpanEncoder`
+binary format, compared with JSON and with the `LogRecorder` text
+format. Spans have the shape of the `examples.server` requests.
+"""
+import json
+import time
+
+from basictracer.recorder import InMemoryRecorder
+
+from ext.tracer import DebugTracer
+from ext.recorder import format_span
+from ext.encoding import SpanEncoder, SpanDecoder
+
+
+def make_spans(requests):
+    """Returns the finished spans of `requests` server-like traces"""
+    recorder = InMemoryRecorder()
+    tracer = DebugTracer(recorder=recorder)
+    for _ in range(requests):
+        with tracer.start_manual_span('web.request', tags={'url': '/home'}) as request:
+            request.set_tag('http.status_code', 200)
+            with tracer.start_manual_span('cache.query', child_of=request) as cache:
+                with tracer.start_manual_span('db.query_1', child_of=cache):
+                    pass
+            with tracer.start_manual_span('db.query_2', child_of=request):
+                pass
+            with tracer.start_manual_span('notification.enqueue', child_of=request):
+                pass
+            with tracer.start_manual_span('template.render', child_of=request):
+                pass
+    return recorder.get_spans()
+
+
+def encode_json(spans):
+    return ''.join(json.dumps({
+        'name': span.operation_name,
+        'id': span.context.span_id,
+        'trace_id': span.context.trace_id,
+        'parent_id': span.parent_id,
+        'start': span.start_time,
+        'duration': span.duration,
+        'tags': span.tags,
+    }) + '\n' for span in spans).encode('utf-8')
+
+
+def encode_text(spans):
+    return ''.join(format_span(span) + '\n' for span in spans).encode('utf-8')
+
+
+def encode_binary(spans):
+    encoder = SpanEncoder()
+    for span in spans:
+        encoder.encode(span)
+    return encoder.take()
+
+
+def decode_binary(data):
+    return list(SpanDecoder().feed(data))
+
+
+def main(requests=5000):
+    spans = make_spans(requests)
+    print('%-10s %14s %14s' % ('format', 'spans/s', 'bytes/span'))
+    for name, encode in (('text', encode_text), ('json', encode_json), ('binary', encode_binary)):
+        start = time.perf_counter()
+        data = encode(spans)
+        elapsed = time.perf_counter() - start
+        print('%-10s %14.0f %14.1f' % (name, len(spans) / elapsed, len(data) / len(spans)))
+
+    data = encode_binary(spans)
+    start = time.perf_counter()
+    decode_binary(data)
+    elapsed = time.perf_counter() - start
+    print('%-10s %14.0f %14s' % ('decode', len(spans) / elapsed, '-'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Benchmarks the per-spawn overhead of `helpers.TracedPool` compared
+with a plain gevent `Pool`, running 10k greenlets through a pool of
+100 while an ActiveSpan is set in the spawning greenlet.
+"""
+import time
+
+import gevent
+import gevent.pool
+from basictracer.tracer import NoopRecorder
+
+from ext import tracer, helpers
+from ext.active_span_source import GeventActiveSpanSource
+
+
+POOLS = [
+    ('Pool', gevent.pool.Pool),
+    ('TracedPool', helpers.TracedPool),
+]
+
+
+def work(i):
+    gevent.sleep(0)
+    return i
+
+
+def run(pool_class, greenlets, size):
+    """Returns the elapsed seconds for `spawn()`, `map()` and
+    `imap_unordered()` of `greenlets` tasks.
+    """
+    pool = pool_class(size)
+    results = {}
+
+    with tracer.start_active_span('parent'):
+        start = time.perf_counter()
+        for i in range(greenlets):
+            pool.spawn(work, i)
+        pool.join()
+        results['spawn'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pool.map(work, range(greenlets))
+        results['map'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in pool.imap_unordered(work, range(greenlets)):
+            pass
+        results['imap_unordered'] = time.perf_counter() - start
+
+    return results
+
+
+def main(greenlets=10000, size=100):
+    tracer._active_span_source = GeventActiveSpanSource()
+    tracer.recorder = NoopRecorder()
+
+    print('%-12s %14s %14s %14s' % ('pool', 'spawn', 'map', 'imap_unordered'))
+    for name, pool_class in POOLS:
+        results = run(pool_class, greenlets, size)
+        print('%-12s %14.2f %14.2f %14.2f' % (
+            name,
+            results['spawn'] / greenlets * 1e6,
+            results['map'] / greenlets * 1e6,
+            results['imap_unordered'] / greenlets * 1e6,
+        ))
+    print('(microseconds per greenlet)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Benchmarks the ids per second created by the id generators, in a
+single thread and with many threads generating ids at the same time.
+"""
+import time
+import threading
+
+from ext.ids import RandomIdGenerator, BufferedIdGenerator
+
+
+GENERATORS = [
+    ('random', RandomIdGenerator),
+    ('buffered', BufferedIdGenerator),
+]
+
+
+def run(generator, ids, threads):
+    """Returns the ids per second created by `threads` threads, each one
+    generating `ids` ids.
+    """
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        generate_id = generator.generate_id
+        barrier.wait()
+        for _ in range(ids):
+            generate_id()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    return ids * threads / (time.perf_counter() - start)
+
+
+def main(ids=200000):
+    print('%-10s %8s %14s' % ('generator', 'threads', 'ids/s'))
+    for threads in (1, 4, 16):
+        for name, generator_class in GENERATORS:
+            print('%-10s %8d %14.0f' % (name, threads, run(generator_class(), ids, threads)))
+
+
+if __name__ == '__main__':
+    main()
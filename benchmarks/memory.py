@@ -0,0 +1,51 @@
+"""Benchmarks the memory used by open spans, measured with `tracemalloc`
+as allocated bytes per active `Span`. Each `Span` is a child of the
+previous one and it's activated through an ActiveSpanSource, like it
+happens when many spans are in flight.
+"""
+import tracemalloc
+
+from basictracer.tracer import NoopRecorder
+
+from ext.span import Span, CompactSpan
+from ext.tracer import DebugTracer
+from ext.active_span_source import ThreadActiveSpanSource
+
+
+SPAN_CLASSES = [
+    ('Span', Span),
+    ('CompactSpan', CompactSpan),
+]
+
+
+def bytes_per_span(span_class, spans, tags):
+    """Returns the allocated bytes for each open `Span` with the given
+    number of `tags`.
+    """
+    tracer = DebugTracer(recorder=NoopRecorder(), span_class=span_class)
+    tracer._active_span_source = ThreadActiveSpanSource()
+    opened = []
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(spans):
+        span = tracer.start_active_span('span')
+        for i in range(tags):
+            span.set_tag('tag', i)
+        opened.append(span)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (after - before) / spans
+
+
+def main(spans=10000):
+    print('%-12s %10s %14s' % ('span', 'tags', 'bytes/span'))
+    for tags in (0, 1):
+        for name, span_class in SPAN_CLASSES:
+            size = bytes_per_span(span_class, spans, tags)
+            print('%-12s %10d %14.1f' % (name, tags, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Benchmarks the span creation with and without a `SpanPool`, using
+short spans like the `cache.query` and `db.query_2` ones of the
+`examples.server` workload, while many requests are in flight. Reports
+the throughput and the garbage collector pressure, as the number of
+collections of each generation.
+"""
+import gc
+import time
+
+from basictracer.tracer import NoopRecorder
+
+from ext.pool import SpanPool
+from ext.span import Span, CompactSpan
+from ext.tracer import DebugTracer
+from ext.active_span_source import ThreadActiveSpanSource
+
+
+def run_requests(tracer, requests, concurrency):
+    """Executes `requests` traces of a request with three short children,
+    with `concurrency` requests in flight. Returns the elapsed seconds
+    and the collections per generation.
+    """
+    gc.collect()
+    before = [s['collections'] for s in gc.get_stats()]
+
+    start = time.perf_counter()
+    for _ in range(requests // concurrency):
+        roots = [tracer.start_span('web.request', tags={'url': '/home'}) for _ in range(concurrency)]
+        for root in roots:
+            for operation_name in ('cache.query', 'db.query_1', 'db.query_2'):
+                tracer.start_span(operation_name, child_of=root).finish()
+        for root in roots:
+            root.finish()
+    elapsed = time.perf_counter() - start
+
+    after = [s['collections'] for s in gc.get_stats()]
+    return elapsed, [a - b for a, b in zip(after, before)]
+
+
+def make_tracer(span_class, span_pool):
+    tracer = DebugTracer(recorder=NoopRecorder(), span_class=span_class, span_pool=span_pool)
+    tracer._active_span_source = ThreadActiveSpanSource()
+    return tracer
+
+
+def main(requests=50000, concurrency=1000):
+    print('%-12s %-8s %12s %8s %8s %8s' % ('span', 'pool', 'spans/s', 'gen0', 'gen1', 'gen2'))
+    for name, span_class in (('Span', Span), ('CompactSpan', CompactSpan)):
+        for pooled in (False, True):
+            pool = SpanPool(max_size=concurrency * 4) if pooled else None
+            tracer = make_tracer(span_class, pool)
+            elapsed, collections = run_requests(tracer, requests, concurrency)
+            print('%-12s %-8s %12.0f %8d %8d %8d' % (
+                (name, 'yes' if pooled else 'no', requests * 4 / elapsed) + tuple(collections)))
+
+
+if __name__ == '__main__':
+    main()
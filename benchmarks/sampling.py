@@ -0,0 +1,52 @@
+"""Benchmarks the cost of a small trace (a root `Span` with three nested
+children) when head-based sampling discards most of the traces. The
+baseline is the proposal `Tracer` that uses the `NoopActiveSpanSource`.
+"""
+import time
+
+from basictracer.tracer import NoopRecorder
+
+from proposal import Tracer
+from ext.tracer import DebugTracer
+from ext.sampler import ConstSampler, ProbabilisticSampler
+from ext.active_span_source import ThreadActiveSpanSource
+
+
+def run_traces(tracer, traces):
+    """Executes `traces` traces of four nested spans. Returns the elapsed
+    seconds.
+    """
+    start = time.perf_counter()
+    for _ in range(traces):
+        with tracer.start_active_span('request'):
+            with tracer.start_active_span('cache.query'):
+                pass
+            with tracer.start_active_span('db.query'):
+                with tracer.start_active_span('db.connect'):
+                    pass
+    return time.perf_counter() - start
+
+
+def make_tracer(sampler):
+    tracer = DebugTracer(recorder=NoopRecorder(), sampler=sampler)
+    tracer._active_span_source = ThreadActiveSpanSource()
+    return tracer
+
+
+def main(traces=20000):
+    tracers = [
+        ('noop', Tracer()),
+        ('sampled 100%', make_tracer(ConstSampler(True))),
+        ('sampled 10%', make_tracer(ProbabilisticSampler(0.1))),
+        ('sampled 1%', make_tracer(ProbabilisticSampler(0.01))),
+        ('sampled 0%', make_tracer(ConstSampler(False))),
+    ]
+
+    print('%-14s %14s' % ('tracer', 'us/span'))
+    for name, tracer in tracers:
+        elapsed = run_traces(tracer, traces)
+        print('%-14s %14.2f' % (name, elapsed / (traces * 4) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
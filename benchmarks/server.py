@@ -0,0 +1,103 @@
+"""Benchmarks the asyncio ActiveSpanSource implementations using the
+`examples.server` workload. The simulated I/O (`asyncio.sleep()`) is
+replaced with a plain yield to the loop, so that the results measure
+the tracing overhead and not the waiting time.
+"""
+import time
+import asyncio
+import contextlib
+
+from basictracer.tracer import NoopRecorder
+
+from ext import tracer
+from ext.active_span_source import AsyncioActiveSpanSource, ContextVarActiveSpanSource
+from examples import server
+
+
+SOURCES = [
+    ('asyncio', AsyncioActiveSpanSource),
+    ('contextvars', ContextVarActiveSpanSource),
+]
+
+
+class _FastAsyncio(object):
+    """Proxy of the `asyncio` module where `sleep()` only yields to the
+    event loop, ignoring the requested delay.
+    """
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+    def sleep(self, delay, result=None):
+        return asyncio.sleep(0, result)
+
+
+@contextlib.contextmanager
+def traced_with(source, recorder=None):
+    """Configures the global tracer with the given `source` and a `recorder`
+    that doesn't print anything, restoring the previous state on exit.
+    """
+    old_source, old_recorder = tracer._active_span_source, tracer.recorder
+    tracer._active_span_source = source
+    tracer.recorder = recorder or NoopRecorder()
+    try:
+        yield tracer
+    finally:
+        tracer._active_span_source = old_source
+        tracer.recorder = old_recorder
+
+
+@contextlib.contextmanager
+def fast_server():
+    """Removes the simulated I/O from the `examples.server` module."""
+    server.asyncio = _FastAsyncio()
+    try:
+        yield server
+    finally:
+        server.asyncio = asyncio
+
+
+def run_requests(loop, requests):
+    """Executes `requests` sequential `handle_request()` calls, waiting
+    also for the background notifications. Returns the elapsed seconds.
+    """
+    async def run():
+        for _ in range(requests):
+            await loop.create_task(server.handle_request())
+
+        # wait for the fire-and-forget notifications
+        current = asyncio.current_task()
+        pending = [t for t in asyncio.all_tasks() if t is not current]
+        await asyncio.gather(*pending)
+
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    return time.perf_counter() - start
+
+
+def run_spans(loop, spans):
+    """Executes `spans` sequential `start_active_span()` and `finish()`
+    calls in a single Task. Returns the elapsed seconds.
+    """
+    async def run():
+        for _ in range(spans):
+            with tracer.start_active_span('span'):
+                pass
+
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    return time.perf_counter() - start
+
+
+def main(requests=2000, spans=20000):
+    loop = asyncio.get_event_loop()
+    print('%-12s %14s %14s' % ('source', 'us/request', 'us/span'))
+    with fast_server():
+        for name, source_class in SOURCES:
+            with traced_with(source_class()):
+                per_request = run_requests(loop, requests) / requests
+                per_span = run_spans(loop, spans) / spans
+            print('%-12s %14.2f %14.2f' % (name, per_request * 1e6, per_span * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Benchmarks `TracerStackContext.current_data()` and the
+`TornadoActiveSpanSource` operations while the stack of contexts grows.
+The lookup cost must not depend on the nesting depth; a lookup that
+walks the whole stack is reported as a reference.
+"""
+import time
+import contextlib
+
+from tornado.stack_context import StackContext, _state
+
+from ext.span import NonRecordingSpan
+from ext.tornado.stack_context import TracerStackContext
+from ext.active_span_source import TornadoActiveSpanSource
+
+
+def walk_current_data():
+    """Lookup that walks the stack of contexts for each call"""
+    for ctx in reversed(_state.contexts[0]):
+        if isinstance(ctx, TracerStackContext) and ctx.active:
+            return ctx.data
+
+
+def nested_contexts(depth, tracing):
+    """Returns a context manager that enters `depth` nested contexts. If
+    `tracing` is not set, only the outer one is a `TracerStackContext`
+    and the others are generic `StackContext`.
+    """
+    stack = contextlib.ExitStack()
+    stack.enter_context(TracerStackContext())
+    for _ in range(depth - 1):
+        if tracing:
+            stack.enter_context(TracerStackContext())
+        else:
+            stack.enter_context(StackContext(contextlib.ExitStack))
+    return stack
+
+
+def run(iterations, depth, tracing):
+    source = TornadoActiveSpanSource()
+    span = NonRecordingSpan(None, None)
+    results = {}
+
+    with nested_contexts(depth, tracing):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            walk_current_data()
+        results['walk'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            TracerStackContext.current_data()
+        results['current_data'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            source.make_active(span)
+            source.deactivate(span)
+        results['activation'] = time.perf_counter() - start
+
+    return results
+
+
+def main(iterations=20000):
+    print('%-10s %8s %12s %12s %12s' % ('contexts', 'depth', 'walk', 'current_data', 'activation'))
+    for tracing in (True, False):
+        for depth in (1, 10, 100, 1000):
+            results = run(iterations, depth, tracing)
+            print('%-10s %8d %12.1f %12.1f %12.1f' % (
+                'tracer' if tracing else 'generic',
+                depth,
+                results['walk'] / iterations * 1e9,
+                results['current_data'] / iterations * 1e9,
+                results['activation'] / iterations * 1e9,
+            ))
+    print('(nanoseconds per operation)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmarks spans with many tags, like the `url` tag set by the
+`examples.server` handler, when tags are materialized eagerly (the
+`BasicSpan` reference implementation) or lazily (`Span` and
+`CompactSpan`). Spans are either dropped by the recorder or
+serialized with `format_span()`, like the `LogRecorder` does.
+"""
+import time
+
+from basictracer.span import BasicSpan
+
+from ext.span import Span, CompactSpan
+from ext.tracer import DebugTracer
+from ext.recorder import format_span
+from ext.active_span_source import ThreadActiveSpanSource
+
+
+class EagerSpan(Span):
+    """`Span` that stores tags and logs in a dict as soon as they're set,
+    like the `BasicSpan` reference implementation"""
+    tags = None
+    logs = None
+    set_tag = BasicSpan.set_tag
+    log_kv = BasicSpan.log_kv
+
+
+SPAN_CLASSES = [
+    ('eager', EagerSpan),
+    ('Span', Span),
+    ('CompactSpan', CompactSpan),
+]
+
+
+class DropRecorder(object):
+    """Recorder that discards spans without reading them"""
+    def record_span(self, span):
+        pass
+
+
+class FormatRecorder(object):
+    """Recorder that serializes spans like the `LogRecorder` without
+    printing them"""
+    def record_span(self, span):
+        format_span(span)
+
+
+def run_spans(tracer, spans, tags):
+    """Executes `spans` spans with `tags` tags each. Returns the elapsed
+    seconds.
+    """
+    keys = ['tag.%d' % n for n in range(tags - 2)]
+
+    start = time.perf_counter()
+    for _ in range(spans):
+        with tracer.start_active_span('handle_request') as span:
+            span.set_tag('url', '/home')
+            span.set_tag('http.status_code', 200)
+            for n, key in enumerate(keys):
+                span.set_tag(key, n)
+    return time.perf_counter() - start
+
+
+def main(spans=5000):
+    print('%-12s %-8s %6s %14s' % ('span', 'recorder', 'tags', 'spans/s'))
+    for tags in (10, 25, 50):
+        for recorder_name, recorder in (('drop', DropRecorder()), ('format', FormatRecorder())):
+            for name, span_class in SPAN_CLASSES:
+                tracer = DebugTracer(recorder=recorder, span_class=span_class)
+                tracer._active_span_source = ThreadActiveSpanSource()
+                elapsed = run_spans(tracer, spans, tags)
+                print('%-12s %-8s %6d %14.0f' % (name, recorder_name, tags, spans / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Benchmarks the Tornado ActiveSpanSource implementations with a
+coroutines workload: each request is a traced coroutine that yields
+three traced children and schedules a callback. The `StackContext`
+version requires Tornado < 6, while the `contextvars` one requires the
+asyncio-based loop of Tornado 5+.
+"""
+import time
+
+from tornado import gen
+from tornado import version_info as tornado_version
+from tornado.ioloop import IOLoop
+from basictracer.tracer import NoopRecorder
+
+from ext.tracer import DebugTracer
+from ext.active_span_source import (
+    TracerStackContext,
+    TornadoActiveSpanSource,
+    TornadoContextVarActiveSpanSource,
+)
+
+
+def make_request(tracer):
+    @gen.coroutine
+    def child():
+        yield gen.moment
+        with tracer.start_active_span('child'):
+            pass
+
+    def callback():
+        with tracer.start_active_span('callback'):
+            pass
+
+    @gen.coroutine
+    def request():
+        with tracer.start_active_span('request'):
+            IOLoop.current().add_callback(callback)
+            yield [child() for _ in range(3)]
+
+    return request
+
+
+def run_requests(tracer, requests, scope=None):
+    """Executes `requests` sequential requests, each one in a new
+    `scope` if any. Returns the elapsed seconds.
+    """
+    request = make_request(tracer)
+
+    @gen.coroutine
+    def run():
+        for _ in range(requests):
+            if scope is None:
+                yield request()
+            else:
+                with scope():
+                    future = request()
+                yield future
+
+    start = time.perf_counter()
+    IOLoop.current().run_sync(run)
+    return time.perf_counter() - start
+
+
+def make_tracer(source):
+    tracer = DebugTracer(recorder=NoopRecorder())
+    tracer._active_span_source = source
+    return tracer
+
+
+def main(requests=5000):
+    sources = []
+    if tornado_version < (6,):
+        sources.append(('stack_context', TornadoActiveSpanSource, TracerStackContext))
+    if tornado_version >= (5,):
+        sources.append(('contextvars', TornadoContextVarActiveSpanSource, None))
+
+    print('%-14s %14s' % ('source', 'us/request'))
+    for name, source_class, scope in sources:
+        elapsed = run_requests(make_tracer(source_class()), requests, scope)
+        print('%-14s %14.2f' % (name, elapsed / requests * 1e6))
+
+
+if __name__ == '__main__':
+    main()
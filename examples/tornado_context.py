@@ -0,0 +1,101 @@
+"""Context propagation examples on the asyncio-based Tornado 5+ loop,
+using the `TornadoContextVarActiveSpanSource` instead of a
+`TracerStackContext`.
+"""
+import asyncio
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from ext import tracer
+from ext.tornado.context import spawn_callback
+
+
+def coroutines_propagation():
+    """The Tornado loop executes two chained coroutines; the second
+    traced coroutine is a child of the first one even if a cooperative
+    yield happens. No `TracerStackContext` is required because the
+    ActiveSpan is stored in the current context.
+    """
+    @gen.coroutine
+    def coroutine_child():
+        active_span = tracer.active_span
+        assert active_span is not None
+        yield gen.moment
+        with tracer.start_active_span(operation_name='coroutine_child'):
+            pass
+
+    @gen.coroutine
+    def entrypoint():
+        with tracer.start_active_span(operation_name='coroutine_parent') as span:
+            coro = [coroutine_child() for i in range(5)]
+            yield coro
+
+    return entrypoint()
+
+
+def native_coroutines_propagation():
+    """Like `coroutines_propagation()`, but children are native coroutines
+    that are wrapped in an asyncio `Task` when they're yielded.
+    """
+    async def coroutine_child():
+        active_span = tracer.active_span
+        assert active_span is not None
+        await asyncio.sleep(0)
+        with tracer.start_active_span(operation_name='native_coroutine_child'):
+            pass
+
+    @gen.coroutine
+    def entrypoint():
+        with tracer.start_active_span(operation_name='coroutine_parent') as span:
+            coro = [coroutine_child() for i in range(5)]
+            yield coro
+
+    return entrypoint()
+
+
+def tornado_plain_callback():
+    """The tornado loop executes the entrypoint coroutine that starts
+    a new active Span. Later on, a generic callback is added to the IOLoop
+    that retrieves and closes the previous created Span.
+    """
+    def on_finish():
+        # callback that closes the active Span
+        active_span = tracer.active_span
+        assert active_span is not None
+        active_span.finish()
+
+    @gen.coroutine
+    def entrypoint():
+        # starts a new active Span immediately
+        tracer.start_active_span(operation_name='coroutine')
+
+        # the asyncio loop copies the current context in the callback
+        IOLoop.current().add_callback(on_finish)
+        yield gen.moment
+
+    return entrypoint()
+
+
+def tornado_spawn_callback():
+    """The tornado loop executes the entrypoint coroutine that starts
+    a new active Span. Later on, a fire-and-forget callback is spawned
+    in an empty context, so it doesn't inherit the active Span.
+    """
+    def on_finish():
+        # this callback doesn't inherit the active Span from the
+        # other coroutine
+        active_span = tracer.active_span
+        assert active_span is None
+
+    @gen.coroutine
+    def entrypoint():
+        # starts a new active Span immediately
+        span = tracer.start_active_span(operation_name='coroutine')
+
+        # `IOLoop.spawn_callback()` would propagate the current context
+        spawn_callback(on_finish)
+        yield gen.moment
+        span.finish()
+
+    return entrypoint()
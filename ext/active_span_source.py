@@ -1,10 +1,144 @@
+import time
 import asyncio
+import weakref
 import threading
 import gevent.local
 
-from ext.tornado.stack_context import TracerStackContext
+try:
+    import contextvars
+except ImportError:  # pragma: no cover
+    # `contextvars` is available only in Python 3.7+
+    contextvars = None
+
+try:
+    from ext.tornado.stack_context import TracerStackContext
+except ImportError:  # pragma: no cover
+    # `tornado.stack_context` has been removed in Tornado 6
+    TracerStackContext = None
+
 from proposal.active_span_source import BaseActiveSpanSource
 
+from .span import NonRecordingSpan
+
+try:
+    _get_running_loop = asyncio._get_running_loop
+    _current_task = asyncio.current_task
+except AttributeError:  # pragma: no cover
+    # `asyncio.current_task()` is available only in Python 3.7+
+    _get_running_loop = asyncio.events._get_running_loop
+    _current_task = asyncio.Task.current_task
+
+
+def current_task():
+    """Returns the `Task` running in the current thread, or `None` when
+    the thread is not running a loop or the loop is not running a Task.
+    Unlike `asyncio.get_event_loop()`, it never creates a loop.
+    """
+    loop = _get_running_loop()
+    if loop is None:
+        return None
+    return _current_task(loop)
+
+
+class _Link(object):
+    """Link of the restore chain, stored by the ActiveSpanSource as the
+    current ActiveSpan, with a strong reference to the link restored
+    when the `Span` is deactivated. The activated `Span` is referenced
+    strongly (`span`) only until it's deactivated, then through a weak
+    reference (`ref`): descendants don't keep finished spans alive, while
+    an execution unit that is gone doesn't keep alive the spans it never
+    finished.
+
+    Links are shared with the execution units created while they're
+    active (i.e. tasks that copy the current context), so a deactivated
+    link keeps the `tracer` and the `context` of its `Span`: when the
+    `Span` has been collected, it's replaced by a `NonRecordingSpan`
+    with the same context, and children still have the right parent.
+    """
+    __slots__ = ('span', 'ref', 'tracer', 'context', 'to_restore')
+
+
+def _link(span, to_restore):
+    link = _Link()
+    link.span = span
+    link.to_restore = to_restore
+    return link
+
+
+def _resolve(link):
+    """Returns the `Span` of the link, or a `NonRecordingSpan` with its
+    context if it has been deactivated and collected.
+    """
+    if link is None:
+        return None
+
+    span = link.span
+    if span is None:
+        span = link.ref()
+        if span is None:
+            span = NonRecordingSpan(link.tracer, link.context)
+            span._to_restore = link.to_restore
+    return span
+
+
+def _release(link, span):
+    """Releases the link of the activated `span` in the chain that starts
+    at `link`. Returns `True` if `span` is the ActiveSpan of the chain,
+    so that its `_to_restore` link must be restored.
+    """
+    current = link
+    while link is not None:
+        if link.span is span:
+            link.ref = weakref.ref(span)
+            link.tracer = span._tracer
+            link.context = span._context
+            link.span = None
+            return link is current
+        link = link.to_restore
+    return False
+
+
+def restored_span(span):
+    """Returns the `Span` that is restored when `span` is deactivated"""
+    return _resolve(getattr(span, '_to_restore', None))
+
+
+class LiveSpans(object):
+    """Spans activated by an ActiveSpanSource and not finished yet, with
+    their activation time. The `SpanReaper` uses it to find spans that
+    are never finished; spans are referenced weakly, so abandoned ones
+    are still collected. Sources track them only when a `LiveSpans` is
+    set as their `live_spans` (i.e. by the `SpanReaper`).
+    """
+    def __init__(self):
+        self._spans = weakref.WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self._spans)
+
+    def add(self, span):
+        self._spans[span] = time.monotonic()
+
+    def discard(self, span):
+        self._spans.pop(span, None)
+
+    def older_than(self, age):
+        """Returns `(span, age)` pairs of spans activated at least `age`
+        seconds ago.
+        """
+        now = time.monotonic()
+        return [
+            (span, now - activated)
+            for span, activated in self._spans.copy().items()
+            if now - activated >= age
+        ]
+
+
+class _ThreadLocals(threading.local):
+    # a missing attribute of a thread local storage raises internally an
+    # AttributeError, that is much slower than reading a default
+    active_span = None
+
 
 class ThreadActiveSpanSource(BaseActiveSpanSource):
     """This is a simplified implementation to make the multi-threading
@@ -15,33 +149,38 @@ class ThreadActiveSpanSource(BaseActiveSpanSource):
     is used by Tracer developers.
     """
     def __init__(self):
-        self._locals = threading.local()
+        self._locals = _ThreadLocals()
+        self.live_spans = None
 
     def make_active(self, span):
-        # get the current active span and set the ancestor active Span
-        to_restore = self.active_span
+        # get the current link and set it as the one to restore
+        to_restore = self._locals.active_span
         setattr(span, '_to_restore', to_restore)
 
         # set the current active Span
-        setattr(self._locals, 'active_span', span)
+        self._locals.active_span = _link(span, to_restore)
+        if self.live_spans is not None:
+            self.live_spans.add(span)
 
         # explicitly set the flag for automatic deactivation
         span._deactivate_on_finish = True
 
     @property
     def active_span(self):
-        return getattr(self._locals, 'active_span', None)
+        return _resolve(self._locals.active_span)
 
     def deactivate(self, span):
-        # get the current active span and skip if the current active branch
-        # is not the one we're trying to deactivate
-        active = self.active_span
-        if span is not active:
+        if self.live_spans is not None:
+            self.live_spans.discard(span)
+
+        # release the Span and skip if the current active branch is not
+        # the one we're trying to deactivate
+        if not _release(self._locals.active_span, span):
             return
 
-        # get span to restore and reactivate it
+        # get link to restore and reactivate it
         to_restore = getattr(span, '_to_restore', None)
-        setattr(self._locals, 'active_span', to_restore)
+        self._locals.active_span = to_restore
 
 
 class AsyncioActiveSpanSource(BaseActiveSpanSource):
@@ -49,49 +188,114 @@ class AsyncioActiveSpanSource(BaseActiveSpanSource):
     work as expected. It uses the current Task instance as a carrier
     for of the current ActiveSpan available in this execution.
 
+    The Task is retrieved from the loop running in the current thread,
+    so each thread can run its own loop. Outside a Task (plain loop
+    callbacks or threads without a running loop) a thread local storage
+    is used instead.
+
+    New tasks don't have an ActiveSpan: they inherit the one of the
+    current Task, or of the thread local storage, only when they're
+    created with `helpers.ensure_future()`, and not with the plain
+    `asyncio.ensure_future()` or `loop.create_task()`.
+
     Here we store the `active_span` but it could be anything else that
     is used by Tracer developers.
     """
-    def make_active(self, span):
-        # retrieves the current running loop if not provided
-        loop = asyncio.get_event_loop()
+    def __init__(self):
+        self._locals = threading.local()
+        self.live_spans = None
 
-        # get the current active span and set the ancestor active Span
-        to_restore = self.active_span
+    def _carrier(self):
+        # the running Task of this thread, or the thread local storage
+        task = current_task()
+        return self._locals if task is None else task
+
+    def make_active(self, span):
+        # get the current link and set it as the one to restore
+        carrier = self._carrier()
+        to_restore = getattr(carrier, '__active_span', None)
         setattr(span, '_to_restore', to_restore)
 
-        # get the current running Task and set a new Span
-        task = asyncio.Task.current_task(loop=loop)
-        setattr(task, '__active_span', span)
+        # set a new Span
+        setattr(carrier, '__active_span', _link(span, to_restore))
+        if self.live_spans is not None:
+            self.live_spans.add(span)
 
         # explicitly set the flag for automatic deactivation
         span._deactivate_on_finish = True
 
     @property
     def active_span(self):
-        # retrieves the current running loop if not provided
-        loop = asyncio.get_event_loop()
+        return _resolve(getattr(self._carrier(), '__active_span', None))
 
-        # get the current running Task for this loop and return the ActiveSpan
-        task = asyncio.Task.current_task(loop=loop)
-        return getattr(task, '__active_span', None)
+    def inherit(self, task):
+        """Sets the ActiveSpan of the current Task, or of the thread local
+        storage outside a Task, in a new `task`. They share the restore
+        chain, so the new `task` restores the same spans.
+        """
+        setattr(task, '__active_span', getattr(self._carrier(), '__active_span', None))
 
     def deactivate(self, span):
-        # retrieves the current running loop if not provided
-        loop = asyncio.get_event_loop()
+        if self.live_spans is not None:
+            self.live_spans.discard(span)
 
-        # get the current active span and skip if the current active branch
-        # is not the one we're trying to deactivate
-        active = self.active_span
-        if span is not active:
+        # release the Span and skip if the current active branch is not
+        # the one we're trying to deactivate
+        carrier = self._carrier()
+        if not _release(getattr(carrier, '__active_span', None), span):
             return
 
-        # get span to restore
+        # get link to restore and reactivate it
         to_restore = getattr(span, '_to_restore', None)
+        setattr(carrier, '__active_span', to_restore)
 
-        # restore it
-        task = asyncio.Task.current_task(loop=loop)
-        setattr(task, '__active_span', to_restore)
+
+class ContextVarActiveSpanSource(BaseActiveSpanSource):
+    """Implementation that uses a `contextvars.ContextVar` as a carrier
+    of the current ActiveSpan. Each operation is a single read or write
+    of the context variable, without retrieving the current loop or
+    `Task` like the `AsyncioActiveSpanSource` does.
+
+    Because `loop.create_task()` copies the current context when the
+    `Task` is created, the ActiveSpan is inherited by new tasks without
+    using `helpers.ensure_future()`. It requires Python 3.7+.
+    """
+    def __init__(self):
+        if contextvars is None:
+            raise RuntimeError('ContextVarActiveSpanSource requires Python 3.7+')
+
+        self._active_span = contextvars.ContextVar('active_span', default=None)
+        self.live_spans = None
+
+    def make_active(self, span):
+        # get the current link and set it as the one to restore
+        to_restore = self._active_span.get()
+        setattr(span, '_to_restore', to_restore)
+
+        # set the current active Span
+        self._active_span.set(_link(span, to_restore))
+        if self.live_spans is not None:
+            self.live_spans.add(span)
+
+        # explicitly set the flag for automatic deactivation
+        span._deactivate_on_finish = True
+
+    @property
+    def active_span(self):
+        return _resolve(self._active_span.get())
+
+    def deactivate(self, span):
+        if self.live_spans is not None:
+            self.live_spans.discard(span)
+
+        # release the Span and skip if the current active branch is not
+        # the one we're trying to deactivate
+        if not _release(self._active_span.get(), span):
+            return
+
+        # get link to restore and reactivate it
+        to_restore = getattr(span, '_to_restore', None)
+        self._active_span.set(to_restore)
 
 
 class GeventActiveSpanSource(BaseActiveSpanSource):
@@ -104,30 +308,35 @@ class GeventActiveSpanSource(BaseActiveSpanSource):
     """
     def __init__(self):
         self._locals = gevent.local.local()
+        self.live_spans = None
 
     def make_active(self, span):
-        # get the current active span and set the ancestor active Span
-        to_restore = self.active_span
+        # get the current link and set it as the one to restore
+        to_restore = getattr(self._locals, 'active_span', None)
         setattr(span, '_to_restore', to_restore)
 
         # set the current active Span
-        setattr(self._locals, 'active_span', span)
+        setattr(self._locals, 'active_span', _link(span, to_restore))
+        if self.live_spans is not None:
+            self.live_spans.add(span)
 
         # explicitly set the flag for automatic deactivation
         span._deactivate_on_finish = True
 
     @property
     def active_span(self):
-        return getattr(self._locals, 'active_span', None)
+        return _resolve(getattr(self._locals, 'active_span', None))
 
     def deactivate(self, span):
-        # get the current active span and skip if the current active branch
-        # is not the one we're trying to deactivate
-        active = self.active_span
-        if span is not active:
+        if self.live_spans is not None:
+            self.live_spans.discard(span)
+
+        # release the Span and skip if the current active branch is not
+        # the one we're trying to deactivate
+        if not _release(getattr(self._locals, 'active_span', None), span):
             return
 
-        # get span to restore and reactivate it
+        # get link to restore and reactivate it
         to_restore = getattr(span, '_to_restore', None)
         setattr(self._locals, 'active_span', to_restore)
 
@@ -135,8 +344,13 @@ class GeventActiveSpanSource(BaseActiveSpanSource):
 class TornadoActiveSpanSource(BaseActiveSpanSource):
     """Implementation that makes use of a context-local `StackContext`
     to persist the current ActiveSpan. This is an example and here we
-    may find better carriers than crafted ones.
+    may find better carriers than crafted ones. It requires Tornado < 6.
     """
+    def __init__(self):
+        if TracerStackContext is None:
+            raise RuntimeError('TornadoActiveSpanSource requires Tornado < 6')
+        self.live_spans = None
+
     def make_active(self, span):
         data = TracerStackContext.current_data()
         # safe-guard if we're tracing outside a TracingStackContext;
@@ -144,12 +358,14 @@ class TornadoActiveSpanSource(BaseActiveSpanSource):
         if data is None:
             return
 
-        # get the current active span and set the ancestor active Span
-        to_restore = self.active_span
+        # get the current link and set it as the one to restore
+        to_restore = data.get('active_span')
         setattr(span, '_to_restore', to_restore)
 
         # set the current active Span
-        data['active_span'] = span
+        data['active_span'] = _link(span, to_restore)
+        if self.live_spans is not None:
+            self.live_spans.add(span)
 
         # explicitly set the flag for automatic deactivation
         span._deactivate_on_finish = True
@@ -158,21 +374,43 @@ class TornadoActiveSpanSource(BaseActiveSpanSource):
     def active_span(self):
         data = TracerStackContext.current_data()
         if data is not None:
-            return data.get('active_span')
+            return _resolve(data.get('active_span'))
 
     def deactivate(self, span):
+        if self.live_spans is not None:
+            self.live_spans.discard(span)
+
         data = TracerStackContext.current_data()
         # safe-guard if we're tracing outside a TracingStackContext;
         # we may find a better solution in a real implementation
         if data is None:
             return
 
-        # get the current active span and skip if the current active branch
-        # is not the one we're trying to deactivate
-        active = self.active_span
-        if span is not active:
+        # release the Span and skip if the current active branch is not
+        # the one we're trying to deactivate
+        if not _release(data.get('active_span'), span):
             return
 
-        # get span to restore and reactivate it
+        # get link to restore and reactivate it
         to_restore = getattr(span, '_to_restore', None)
         data['active_span'] = to_restore
+
+
+class TornadoContextVarActiveSpanSource(ContextVarActiveSpanSource):
+    """Implementation for Tornado 5+ that doesn't need `StackContext`,
+    available only with the asyncio-based IOLoop. The ActiveSpan is
+    stored in a `contextvars.ContextVar`: the asyncio loop copies the
+    current context when a callback is scheduled, so the ActiveSpan is
+    propagated in `IOLoop.add_callback()` and in `gen.coroutine`
+    children, without wrapping any of them.
+
+    On asyncio `IOLoop.spawn_callback()` is the same of `add_callback()`,
+    so fire-and-forget callbacks that must not inherit the ActiveSpan
+    are scheduled with `ext.tornado.context.spawn_callback()`.
+
+    Tornado 6 runs each coroutine in a copy of the caller context, so a
+    `Span` activated in a child coroutine is not visible to its caller;
+    Tornado 5 doesn't copy it, so until the first yield the child
+    shares the context of its caller like with the `TracerStackContext`.
+    """
+    pass
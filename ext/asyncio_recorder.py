@@ -0,0 +1,211 @@
+"""Recorder that writes spans from the asyncio event loop, without
+blocking the coroutine that finishes the `Span`.
+"""
+import sys
+import asyncio
+import threading
+import collections
+
+from .encoding import SpanEncoder, encode_datagrams
+from .recorder import format_span
+
+
+class AsyncioRecorder():
+    """Recorder implementation for asyncio applications. Finishing a
+    `Span` only appends it to a bounded buffer; a single background Task
+    in the event loop drains it in batches of `max_batch_size` spans,
+    when the batch is full or every `flush_interval` seconds, yielding
+    to the loop between batches.
+
+    Spans are sent to a `Collector` listening on `address`, through an
+    asyncio stream for a Unix socket path or a datagram endpoint for a
+    `(host, port)` tuple, or written in a file-like `stream` in the
+    default executor. Like in the `BatchingRecorder`, a `stream` receives
+    text unless an `encoder` is given. Datagrams are decoded alone, so a
+    batch is split in datagrams of at most `max_datagram_size` bytes
+    (the `Collector` reads up to 8192 bytes) and spans that don't fit in
+    a datagram are dropped. When the collector is not
+    reachable the batch is dropped and the connection is retried with
+    the next batch. Other errors raised while writing are reported in
+    the stderr and the batch is counted in `failed_spans`, without
+    stopping the Task.
+
+    The Task is created with `start()` and it writes all queued spans
+    when `close()` is awaited or when it's cancelled because the loop is
+    shutting down (i.e. at the end of `asyncio.run()`). Like in the
+    `BatchingRecorder`, spans are released to a `SpanPool` only through
+    the `release` callback, once they're written.
+    """
+    keeps_spans = True
+
+    def __init__(self, address=None, stream=None, max_queue_size=4096,
+                 max_batch_size=512, flush_interval=1.0, encoder=None,
+                 max_datagram_size=8192, release=None):
+        if (address is None) == (stream is None):
+            raise ValueError('Either an address or a stream is required')
+
+        self.address = address
+        self.stream = stream
+        self.encoder = encoder
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_datagram_size = max_datagram_size
+        self.release = release
+
+        # counters available for monitoring
+        self.dropped_spans = 0
+        self.flushed_spans = 0
+        self.failed_spans = 0
+
+        self._spans = collections.deque()
+        self._closed = False
+        self._loop = None
+        self._thread_id = None
+        self._wakeup = None
+        self._task = None
+        self._writer = None
+        self._encoder = None
+
+    def start(self):
+        """Starts the background Task in the running event loop; it must
+        be called from a coroutine or a callback.
+        """
+        if self._task is not None:
+            return
+
+        self._loop = asyncio.get_event_loop()
+        self._thread_id = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def record_span(self, span):
+        if self._closed or len(self._spans) >= self.max_queue_size:
+            self.dropped_spans += 1
+            if self.release is not None:
+                self.release(span)
+            return
+
+        self._spans.append(span)
+        if len(self._spans) >= self.max_batch_size and self._task is not None:
+            if threading.get_ident() == self._thread_id:
+                self._wakeup.set()
+            else:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def flush(self):
+        """Writes all spans that are waiting in the buffer"""
+        while self._spans:
+            batch = []
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self._spans.popleft())
+            except IndexError:
+                pass
+
+            try:
+                written = await self._write(batch)
+            except asyncio.CancelledError:
+                # it's an `Exception` in Python 3.7
+                raise
+            except Exception as e:
+                self.failed_spans += len(batch)
+                sys.stderr.write('%s failed to write %d spans: %r\n' % (
+                    type(self).__name__, len(batch), e))
+            else:
+                if written is True:
+                    written = len(batch)
+                self.flushed_spans += written
+                self.dropped_spans += len(batch) - written
+
+            if self.release is not None:
+                for span in batch:
+                    self.release(span)
+
+            # let other Tasks run between batches
+            await asyncio.sleep(0)
+
+    async def _write(self, batch):
+        """Writes a batch of spans, returning `False` if they have been
+        dropped, or the number of spans written if only some of them have
+        been.
+        """
+        if self.stream is not None:
+            try:
+                if self.encoder is None:
+                    data = '\n'.join(format_span(span) for span in batch) + '\n'
+                else:
+                    for span in batch:
+                        self.encoder.encode(span)
+                    data = self.encoder.take()
+                await self._loop.run_in_executor(None, self._write_stream, data)
+            except BaseException:
+                if self.encoder is not None:
+                    # the reader may have missed interned strings
+                    del self.encoder.buffer[:]
+                    self.encoder.reset()
+                raise
+            return True
+
+        sent = 0
+        try:
+            if isinstance(self.address, str):
+                if self._writer is None:
+                    _, self._writer = await asyncio.open_unix_connection(self.address)
+                    # the strings table is bound to the connection stream
+                    self._encoder = SpanEncoder()
+
+                for span in batch:
+                    self._encoder.encode(span)
+                self._writer.write(self._encoder.take())
+                await self._writer.drain()
+                sent = len(batch)
+            else:
+                if self._writer is None:
+                    self._writer, _ = await self._loop.create_datagram_endpoint(
+                        asyncio.DatagramProtocol, remote_addr=self.address)
+
+                for data, count in encode_datagrams(batch, self.max_datagram_size):
+                    self._writer.sendto(data)
+                    sent += count
+        except OSError:
+            self._close_writer()
+        except BaseException:
+            # the collector may have missed interned strings
+            self._close_writer()
+            raise
+        return sent
+
+    def _write_stream(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+
+    async def close(self):
+        """Stops the background Task, writing all queued spans. Spans
+        recorded after this call are dropped.
+        """
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+
+    async def _run(self):
+        try:
+            while not self._closed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self.flush()
+        finally:
+            # closed, or cancelled because the loop is shutting down:
+            # write what is left
+            self._closed = True
+            await self.flush()
+            self._close_writer()
@@ -0,0 +1,62 @@
+"""Clock used to time spans. Timestamps are integer nanoseconds of the
+monotonic `perf_counter` clock, so they're cheap to take, they keep
+their precision for very short spans and they don't jump when the wall
+clock is adjusted. A single wall-clock anchor is taken when the module
+is imported, and again in the child after a fork; wall times are
+derived from it only when spans are exported.
+"""
+import os
+import time
+
+try:
+    now = time.perf_counter_ns
+    _wall_ns = time.time_ns
+except AttributeError:  # pragma: no cover
+    # nanoseconds clocks are available only in Python 3.7+
+    def now():
+        return int(time.perf_counter() * 1000000000)
+
+    def _wall_ns():
+        return int(time.time() * 1000000000)
+
+
+# wall clock nanoseconds minus monotonic nanoseconds at the anchor
+_offset = 0
+
+
+def anchor():
+    """Takes a new wall-clock anchor. Timestamps taken before keep
+    their monotonic value, so durations are not affected.
+    """
+    global _offset
+    _offset = _wall_ns() - now()
+
+
+def to_wall_ns(timestamp):
+    """Converts a monotonic timestamp to unix time in nanoseconds"""
+    return timestamp + _offset
+
+
+def to_wall(timestamp):
+    """Converts a monotonic timestamp to unix time in seconds, like
+    `time.time()`
+    """
+    return (timestamp + _offset) / 1e9
+
+
+def from_wall(seconds):
+    """Converts unix time in seconds (i.e. an explicit `start_time` or
+    `finish_time`) to a monotonic timestamp
+    """
+    return int(round(seconds * 1000000000)) - _offset
+
+
+def format_ns(nanoseconds):
+    """Formats nanoseconds as seconds without losing precision"""
+    sign = '-' if nanoseconds < 0 else ''
+    return '%s%d.%09d' % ((sign,) + divmod(abs(nanoseconds), 1000000000))
+
+
+anchor()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=anchor)
@@ -0,0 +1,197 @@
+"""Local collector agent that receives span batches encoded with the
+`SpanEncoder` format, and the reporter that sends them. The collector
+listens on a Unix domain socket (a path) or on UDP (a `(host, port)`
+tuple) and it can be executed as a standalone process::
+
+    python -m ext.collector /tmp/spans.sock
+"""
+import os
+import sys
+import time
+import queue
+import socket
+import threading
+import collections
+import socketserver
+
+from .encoding import SpanEncoder, SpanDecoder, encode_datagrams
+from .recorder import BatchingRecorder, LogRecorder
+
+
+class _Connection(object):
+    """Persistent connection to the collector. When the connection fails
+    it's closed and a new one is attempted only after a backoff delay,
+    which doubles for each failure up to `max_backoff` seconds.
+    """
+    def __init__(self, address, min_backoff, max_backoff, max_datagram_size):
+        self.address = address
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_datagram_size = max_datagram_size
+        self.backoff = min_backoff
+        self.retry_at = 0
+        self.socket = None
+        self.encoder = None
+
+    def _connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.address)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect(self.address)
+        self.socket = sock
+        # the strings table is bound to the connection stream
+        self.encoder = SpanEncoder()
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+        self.socket = None
+        self.encoder = None
+
+    def send(self, batch):
+        """Sends the batch, returning the number of spans sent"""
+        if self.socket is None:
+            if time.monotonic() < self.retry_at:
+                return 0
+
+        sent = 0
+        try:
+            if self.socket is None:
+                self._connect()
+
+            if self.socket.type == socket.SOCK_DGRAM:
+                # each datagram must be decoded alone
+                for data, count in encode_datagrams(batch, self.max_datagram_size):
+                    self.socket.send(data)
+                    sent += count
+            else:
+                for span in batch:
+                    self.encoder.encode(span)
+                self.socket.sendall(self.encoder.take())
+                sent = len(batch)
+        except OSError:
+            self.close()
+            self.retry_at = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return sent
+
+        self.backoff = self.min_backoff
+        return sent
+
+
+class CollectorReporter(BatchingRecorder):
+    """Recorder that sends batches of spans to a local `Collector`,
+    through a pool of `connections` persistent connections. Batches are
+    sent when they have `max_batch_size` spans or after `flush_interval`
+    seconds, like the `BatchingRecorder`; if the collector is not
+    reachable the batch is dropped and the connection is retried with
+    an exponential backoff.
+
+    Over UDP a batch is split in datagrams of at most `max_datagram_size`
+    bytes (the `Collector` reads up to 8192 bytes), each one decoded
+    alone; spans that don't fit in a datagram are dropped.
+    """
+    def __init__(self, address, connections=2, min_backoff=0.1, max_backoff=10.0,
+                 max_datagram_size=8192, **kwargs):
+        self.address = address
+        self._connections = queue.Queue()
+        for _ in range(connections):
+            self._connections.put(
+                _Connection(address, min_backoff, max_backoff, max_datagram_size))
+        super(CollectorReporter, self).__init__(**kwargs)
+
+    def _write(self, batch):
+        connection = self._connections.get()
+        try:
+            return connection.send(batch)
+        finally:
+            self._connections.put(connection)
+
+    def close(self):
+        super(CollectorReporter, self).close()
+        while not self._connections.empty():
+            self._connections.get().close()
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        decoder = SpanDecoder()
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            self.server.collector.collect(decoder.feed(data))
+
+
+class _DatagramHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = self.request[0]
+        self.server.collector.collect(SpanDecoder().feed(data))
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Collector(object):
+    """Local collector that receives span batches from `CollectorReporter`
+    instances. Received spans are passed to `recorder` and aggregated by
+    operation name (count and total duration) in `operations`. It can
+    run in a background thread with `start()`, i.e. as a stand-in for
+    tests, or in the foreground with `serve_forever()`.
+    """
+    def __init__(self, address, recorder=None):
+        self.address = address
+        self.recorder = recorder or LogRecorder()
+        self.received_spans = 0
+        self.operations = collections.defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+        self._thread = None
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = _UnixServer(address, _StreamHandler)
+        else:
+            self.server = socketserver.UDPServer(address, _DatagramHandler)
+        self.server.collector = self
+
+    def collect(self, spans):
+        with self._lock:
+            for span in spans:
+                self.received_spans += 1
+                stats = self.operations[span.operation_name]
+                stats[0] += 1
+                stats[1] += span.duration
+                self.recorder.record_span(span)
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='Collector')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+if __name__ == '__main__':
+    collector = Collector(sys.argv[1] if len(sys.argv) > 1 else '/tmp/spans.sock')
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.stop()
+        for name, (count, duration) in sorted(collector.operations.items()):
+            print('%-30s %10d %14fs' % (name, count, duration), file=sys.stderr)
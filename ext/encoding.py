@@ -0,0 +1,283 @@
+import struct
+
+from basictracer.context import SpanContext
+
+from .span import FinishedSpan
+
+
+# record types
+RESET = 0x00
+SPAN = 0x01
+
+# tag and log value types
+NONE = 0x00
+FALSE = 0x01
+TRUE = 0x02
+INT = 0x03
+FLOAT = 0x04
+STR = 0x05
+BYTES = 0x06
+
+_DOUBLE = struct.Struct('<d')
+
+
+def _write_varint(buf, value):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _write_signed(buf, value):
+    # zig-zag encoding, so that small negative values stay small
+    _write_varint(buf, value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_signed(data, pos):
+    value, pos = _read_varint(data, pos)
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+
+
+class SpanEncoder(object):
+    """Compact binary encoder for finished spans. Spans are appended in a
+    reusable `bytearray` as a stream of records: ids are varints,
+    timestamps are integer nanoseconds, while operation names and tag
+    keys are interned. An interned string is written inline the first
+    time (reference `0` followed by its bytes) and later referenced by
+    its position in the strings table (plus one).
+
+    When the strings table has `max_strings` entries a `RESET` record is
+    written and it starts from scratch. Use `take()` to get the encoded
+    bytes and reuse the buffer. Any recorder can use the encoder in its
+    `record_span()`.
+    """
+    def __init__(self, max_strings=4096):
+        self.buffer = bytearray()
+        self.max_strings = max_strings
+        self._strings = {}
+
+    def reset(self):
+        """Clears the strings table; the decoder is reset too."""
+        self.buffer.append(RESET)
+        self._strings.clear()
+
+    def take(self):
+        """Returns the encoded bytes and empties the buffer."""
+        data = bytes(self.buffer)
+        del self.buffer[:]
+        return data
+
+    def _write_string(self, value):
+        index = self._strings.get(value)
+        if index is not None:
+            _write_varint(self.buffer, index + 1)
+            return
+
+        self._strings[value] = len(self._strings)
+        encoded = value.encode('utf-8')
+        self.buffer.append(0)
+        _write_varint(self.buffer, len(encoded))
+        self.buffer += encoded
+
+    def _write_value(self, value):
+        buf = self.buffer
+        if value is None:
+            buf.append(NONE)
+        elif value is True:
+            buf.append(TRUE)
+        elif value is False:
+            buf.append(FALSE)
+        elif isinstance(value, int):
+            buf.append(INT)
+            _write_signed(buf, value)
+        elif isinstance(value, float):
+            buf.append(FLOAT)
+            buf += _DOUBLE.pack(value)
+        elif isinstance(value, bytes):
+            buf.append(BYTES)
+            _write_varint(buf, len(value))
+            buf += value
+        else:
+            encoded = str(value).encode('utf-8')
+            buf.append(STR)
+            _write_varint(buf, len(encoded))
+            buf += encoded
+
+    def _write_pairs(self, key_values):
+        _write_varint(self.buffer, len(key_values))
+        for key, value in key_values.items():
+            self._write_string(str(key))
+            self._write_value(value)
+
+    def encode(self, span):
+        """Appends the given finished `span` to the buffer."""
+        if len(self._strings) >= self.max_strings:
+            self.reset()
+
+        ctx = span._context
+        buf = self.buffer
+        buf.append(SPAN)
+        _write_varint(buf, ctx.trace_id)
+        _write_varint(buf, ctx.span_id)
+        _write_varint(buf, 0 if span.parent_id is None else span.parent_id + 1)
+        self._write_string(span.operation_name or '')
+        _write_varint(buf, span.start_time_ns)
+        _write_signed(buf, span.duration_ns)
+        self._write_pairs(span.tags)
+
+        logs = span.logs_ns
+        _write_varint(buf, len(logs))
+        for key_values, timestamp in logs:
+            _write_varint(buf, timestamp)
+            self._write_pairs(key_values)
+
+
+def encode_datagrams(spans, max_size):
+    """Encodes `spans` in chunks of at most `max_size` bytes that can be
+    decoded alone (i.e. UDP datagrams), yielding `(data, count)` pairs
+    where `count` is the number of spans in the chunk. Spans that don't
+    fit in `max_size` bytes alone are skipped.
+    """
+    encoder = SpanEncoder()
+    count = 0
+    for span in spans:
+        size = len(encoder.buffer)
+        encoder.encode(span)
+        if len(encoder.buffer) <= max_size:
+            count += 1
+            continue
+
+        # yield the previous spans and encode this one again with an
+        # empty strings table
+        data = encoder.take()
+        if count:
+            yield data[:size], count
+        encoder = SpanEncoder()
+        encoder.encode(span)
+        count = 1
+        if len(encoder.buffer) > max_size:
+            # its strings are not defined in the next chunk
+            encoder = SpanEncoder()
+            count = 0
+
+    if count:
+        yield encoder.take(), count
+
+
+class SpanDecoder(object):
+    """Streaming decoder of the `SpanEncoder` format. Data can be fed in
+    chunks of any size: incomplete records are kept until the next
+    chunk arrives. Decoded spans are `FinishedSpan` instances, which
+    keep log timestamps in nanoseconds like the encoded data.
+    """
+    def __init__(self):
+        self._pending = b''
+        self._strings = []
+
+    def feed(self, data):
+        """Decodes `data` and yields all the complete spans."""
+        data = self._pending + bytes(data) if self._pending else bytes(data)
+        self._view = memoryview(data)
+        pos = 0
+        try:
+            while pos < len(data):
+                record = data[pos]
+                if record == RESET:
+                    self._strings = []
+                    pos += 1
+                elif record == SPAN:
+                    known = len(self._strings)
+                    try:
+                        span, pos = self._read_span(data, pos + 1)
+                    except IndexError:
+                        # incomplete record: forget its strings and
+                        # wait for more data
+                        del self._strings[known:]
+                        break
+                    yield span
+                else:
+                    raise ValueError('unknown record type %d' % record)
+        finally:
+            self._pending = data[pos:]
+            self._view = None
+
+    def _read_string(self, data, pos):
+        index, pos = _read_varint(data, pos)
+        if index:
+            return self._strings[index - 1], pos
+
+        length, pos = _read_varint(data, pos)
+        if pos + length > len(data):
+            raise IndexError
+        value = str(self._view[pos:pos + length], 'utf-8')
+        self._strings.append(value)
+        return value, pos + length
+
+    def _read_value(self, data, pos):
+        kind = data[pos]
+        pos += 1
+        if kind == NONE:
+            return None, pos
+        if kind == TRUE:
+            return True, pos
+        if kind == FALSE:
+            return False, pos
+        if kind == INT:
+            return _read_signed(data, pos)
+        if kind == FLOAT:
+            if pos + 8 > len(data):
+                raise IndexError
+            return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+
+        length, pos = _read_varint(data, pos)
+        if pos + length > len(data):
+            raise IndexError
+        value = bytes(self._view[pos:pos + length])
+        return (value if kind == BYTES else value.decode('utf-8')), pos + length
+
+    def _read_pairs(self, data, pos):
+        pairs = {}
+        count, pos = _read_varint(data, pos)
+        for _ in range(count):
+            key, pos = self._read_string(data, pos)
+            pairs[key], pos = self._read_value(data, pos)
+        return pairs, pos
+
+    def _read_span(self, data, pos):
+        trace_id, pos = _read_varint(data, pos)
+        span_id, pos = _read_varint(data, pos)
+        parent_id, pos = _read_varint(data, pos)
+        name, pos = self._read_string(data, pos)
+        start, pos = _read_varint(data, pos)
+        duration, pos = _read_signed(data, pos)
+        tags, pos = self._read_pairs(data, pos)
+
+        logs = []
+        count, pos = _read_varint(data, pos)
+        for _ in range(count):
+            timestamp, pos = _read_varint(data, pos)
+            key_values, pos = self._read_pairs(data, pos)
+            logs.append((key_values, timestamp))
+
+        span = FinishedSpan(
+            name,
+            SpanContext(trace_id=trace_id, span_id=span_id),
+            None if parent_id == 0 else parent_id - 1,
+            start,
+            duration,
+            tags,
+            logs,
+        )
+        return span, pos
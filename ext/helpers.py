@@ -1,8 +1,18 @@
 import gevent
 import asyncio
+import functools
 import threading
+import gevent.pool
+import multiprocessing
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from basictracer.context import SpanContext
 
 from ext import tracer
+from ext.pool import pin
+from ext.span import SpanContinuation, FinishedSpan
+from ext.active_span_source import ThreadActiveSpanSource, restored_span
 
 
 class TracedThread(threading.Thread):
@@ -13,14 +23,19 @@ class TracedThread(threading.Thread):
         # implementation detail
         # get the ActiveSpan when we're in the "parent" thread
         self._active_span = tracer.active_span
+        self._pin = pin(self._active_span)
         super(TracedThread, self).__init__(*args, **kwargs)
 
     def run(self):
         # implementation detail
-        # set the ActiveSpan in this thread and remove the local reference
+        # set the ActiveSpan in this thread and remove the local references
+        # when the thread is done with it
         tracer.active_span_source.make_active(self._active_span)
         del self._active_span
-        super(TracedThread, self).run()
+        try:
+            super(TracedThread, self).run()
+        finally:
+            del self._pin
 
 
 class TracedGreenlet(gevent.Greenlet):
@@ -30,6 +45,7 @@ class TracedGreenlet(gevent.Greenlet):
     def __init__(self, *args, **kwargs):
         # get the current active span when we're in the "parent" greenlet
         self._active_span = tracer.active_span
+        self._pin = pin(self._active_span)
 
         # create the Greenlet as usual
         super(TracedGreenlet, self).__init__(*args, **kwargs)
@@ -40,7 +56,237 @@ class TracedGreenlet(gevent.Greenlet):
         # a specular implementation of a TracedThread
         tracer.active_span_source.make_active(self._active_span)
         del self._active_span
-        super(TracedGreenlet, self).run()
+        try:
+            super(TracedGreenlet, self).run()
+        finally:
+            del self._pin
+
+
+def _capture():
+    """Returns the current ActiveSpan with its `pin()`, to be executed
+    later by `_run_with_span()`.
+    """
+    active_span = tracer.active_span
+    return active_span, pin(active_span)
+
+
+def _run_with_span(captured, fn, *args, **kwargs):
+    """Executes `fn` while the `captured` ActiveSpan is active in the
+    current execution unit, then restores the previous ActiveSpan.
+    """
+    # the pin is held until `fn` is executed
+    active_span, _ = captured
+    if active_span is None:
+        return fn(*args, **kwargs)
+
+    # activate a continuation so that the restore link of the
+    # original Span, used by the parent, is not overwritten
+    source = tracer.active_span_source
+    continuation = SpanContinuation(active_span)
+    source.make_active(continuation)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # deactivate spans left active by `fn`, if they're
+        # children of the continuation
+        active = source.active_span
+        leaked = []
+        while active is not None and active is not continuation:
+            leaked.append(active)
+            active = restored_span(active)
+
+        if active is continuation:
+            for span in leaked:
+                source.deactivate(span)
+            source.deactivate(continuation)
+
+
+class TracedThreadPoolExecutor(ThreadPoolExecutor):
+    """Helper class OpenTracing-aware, that can be used in place of a
+    `ThreadPoolExecutor`. The ActiveSpan of the caller is captured when
+    a task is submitted (`submit()`, `map()` or `loop.run_in_executor()`)
+    and it's active in the pooled worker while the task is executed.
+
+    The worker uses the tracer ActiveSpanSource, so it must support
+    threads (i.e. `ThreadActiveSpanSource` or `ContextVarActiveSpanSource`
+    for asyncio applications).
+    """
+    def submit(self, fn, *args, **kwargs):
+        # get the ActiveSpan when we're in the caller thread
+        return super(TracedThreadPoolExecutor, self).submit(
+            _run_with_span, _capture(), fn, *args, **kwargs)
+
+
+class _ProcessRecorder(object):
+    """Recorder used in the workers of a `TracedProcessPoolExecutor`.
+    Finished spans are buffered and sent to the parent process in
+    batches of `batch_size` spans, or when a task is completed.
+    """
+    def __init__(self, queue, batch_size):
+        self.queue = queue
+        self.batch_size = batch_size
+        self._spans = []
+
+    def record_span(self, span):
+        self._spans.append(FinishedSpan.from_span(span))
+        if len(self._spans) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._spans:
+            self.queue.put(self._spans)
+            self._spans = []
+
+
+def _init_process_worker(queue, batch_size):
+    # implementation detail
+    # the worker traces in its main thread and ships spans to the parent
+    tracer._active_span_source = ThreadActiveSpanSource()
+    tracer.recorder = _ProcessRecorder(queue, batch_size)
+
+
+def _run_in_process(parent, operation_name, fn, *args, **kwargs):
+    # implementation detail
+    # continue the parent trace with a child Span that lasts for the task
+    trace_id, span_id, baggage, sampled = parent
+    parent_ctx = None
+    if trace_id is not None:
+        parent_ctx = SpanContext(trace_id=trace_id, span_id=span_id,
+                                 baggage=baggage, sampled=sampled)
+    try:
+        span = tracer.start_manual_span(operation_name, child_of=parent_ctx)
+        tracer.active_span_source.make_active(span)
+        with span:
+            return fn(*args, **kwargs)
+    finally:
+        tracer.recorder.flush()
+
+
+class TracedProcessPoolExecutor(ProcessPoolExecutor):
+    """Helper class OpenTracing-aware, that can be used in place of a
+    `ProcessPoolExecutor`. The `SpanContext` of the caller ActiveSpan is
+    sent with each task, and the worker process continues the trace with
+    a child Span named after the task function. Spans finished in the
+    workers are sent back in batches and recorded by the tracer of the
+    parent process, so the process-parallel work is part of one trace.
+
+    It requires Python 3.7+, and tasks must be picklable like with a
+    `ProcessPoolExecutor`.
+    """
+    def __init__(self, max_workers=None, mp_context=None, batch_size=64):
+        self._spans_queue = (mp_context or multiprocessing).Queue()
+        super(TracedProcessPoolExecutor, self).__init__(
+            max_workers=max_workers,
+            mp_context=mp_context,
+            initializer=_init_process_worker,
+            initargs=(self._spans_queue, batch_size),
+        )
+
+        # record spans received from the workers
+        self._receiver = threading.Thread(target=self._receive_spans)
+        self._receiver.daemon = True
+        self._receiver.start()
+
+    def submit(self, fn, *args, **kwargs):
+        # get the SpanContext when we're in the parent process
+        active_span = tracer.active_span
+        ctx = getattr(active_span, 'context', None)
+        parent = (
+            getattr(ctx, 'trace_id', None),
+            getattr(ctx, 'span_id', None),
+            getattr(ctx, 'baggage', None),
+            getattr(ctx, 'sampled', True),
+        )
+        operation_name = getattr(fn, '__name__', 'process.task')
+        return super(TracedProcessPoolExecutor, self).submit(
+            _run_in_process, parent, operation_name, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        # the executor forgets its workers when it's shut down
+        processes = list((self._processes or {}).values())
+        super(TracedProcessPoolExecutor, self).shutdown(wait=wait)
+
+        if wait:
+            self._stop_receiver(processes)
+        else:
+            # workers are still running pending tasks and sending spans
+            stopper = threading.Thread(target=self._stop_receiver, args=(processes,))
+            stopper.daemon = True
+            stopper.start()
+
+    def _stop_receiver(self, processes):
+        for process in processes:
+            process.join()
+
+        # workers have sent all their spans, so this is the last message
+        self._spans_queue.put(None)
+        self._receiver.join()
+
+    def _receive_spans(self):
+        while True:
+            spans = self._spans_queue.get()
+            if spans is None:
+                return
+
+            for span in spans:
+                tracer.recorder.record_span(span)
+
+
+def _with_active_span(func):
+    """Returns a wrapper of `func` that is executed with the current
+    ActiveSpan, or `func` itself if there isn't an ActiveSpan.
+    """
+    captured = _capture()
+    if captured[0] is None:
+        return func
+    return functools.partial(_run_with_span, captured, func)
+
+
+class _TracedGroupMixin(object):
+    """Propagates the ActiveSpan of the spawning greenlet into the ones
+    created by a gevent `Group`. Methods that spawn greenlets through a
+    helper greenlet (`map()`, `imap()`, ...) wrap `func` in the caller,
+    because the helper doesn't have an ActiveSpan.
+    """
+    def spawn(self, func, *args, **kwargs):
+        return super(_TracedGroupMixin, self).spawn(
+            _with_active_span(func), *args, **kwargs)
+
+    def apply_async(self, func, args=None, kwds=None, callback=None):
+        return super(_TracedGroupMixin, self).apply_async(
+            _with_active_span(func), args, kwds, callback)
+
+    def map(self, func, iterable):
+        return super(_TracedGroupMixin, self).map(_with_active_span(func), iterable)
+
+    def map_async(self, func, iterable, callback=None):
+        return super(_TracedGroupMixin, self).map_async(
+            _with_active_span(func), iterable, callback)
+
+    def imap(self, func, *iterables, **kwargs):
+        return super(_TracedGroupMixin, self).imap(
+            _with_active_span(func), *iterables, **kwargs)
+
+    def imap_unordered(self, func, *iterables, **kwargs):
+        return super(_TracedGroupMixin, self).imap_unordered(
+            _with_active_span(func), *iterables, **kwargs)
+
+
+class TracedGroup(_TracedGroupMixin, gevent.pool.Group):
+    """Helper class OpenTracing-aware, that can be used in place of a
+    gevent `Group`. Greenlets spawned in the group continue the trace of
+    the spawning greenlet and the ActiveSpan is released when they finish.
+    """
+    pass
+
+
+class TracedPool(_TracedGroupMixin, gevent.pool.Pool):
+    """Helper class OpenTracing-aware, that can be used in place of a
+    gevent `Pool`, limiting the concurrency like the original one.
+    Greenlets spawned in the pool continue the trace of the spawning
+    greenlet and the ActiveSpan is released when they finish.
+    """
+    pass
 
 
 def ensure_future(coro_or_future, *, loop=None):
@@ -48,12 +294,15 @@ def ensure_future(coro_or_future, *, loop=None):
     Wrapper for the asyncio.ensure_future() function that
     sets a context to the newly created Task. If the current
     task already has a Context, it will be attached to the
-    new Task so the Trace list will be preserved.
+    new Task so the Trace list will be preserved. Outside a
+    Task, the Context of the current thread is used.
     """
     # create the task
     task = asyncio.ensure_future(coro_or_future, loop=loop)
 
-    # propagate the context
-    active_span = tracer.active_span
-    setattr(task, '__active_span', active_span)
+    # propagate the context, sharing the restore chain of the current Task
+    # or of the spans activated outside a Task
+    inherit = getattr(tracer.active_span_source, 'inherit', None)
+    if inherit is not None:
+        inherit(task)
     return task
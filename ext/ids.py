@@ -0,0 +1,67 @@
+import os
+import struct
+import threading
+
+from basictracer.util import generate_id
+
+
+class IdGenerator(object):
+    """IdGenerator creates the trace and span ids used by the tracer.
+    Ids are 64-bit unsigned integers different from zero.
+    """
+    def generate_id(self):
+        raise NotImplementedError
+
+
+class RandomIdGenerator(IdGenerator):
+    """Generator that uses the basictracer implementation: each id is
+    created from a `random.Random` instance shared by all the threads.
+    """
+    def generate_id(self):
+        return generate_id()
+
+
+# incremented in the child process after a fork, so that buffers
+# inherited from the parent are discarded
+_generation = 0
+
+
+def _reseed():
+    global _generation
+    _generation += 1
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reseed)
+
+
+class BufferedIdGenerator(IdGenerator):
+    """Generator that reads random ids from a per-thread buffer, refilled
+    in bulk with `buffer_size` ids from `os.urandom()`, so threads don't
+    share any state. Greenlets of the same thread share the buffer, that
+    is safe because they can't be preempted while an id is taken.
+
+    Buffers are discarded in the child process after a fork (Python
+    3.7+), or when `reseed()` is called, so that parent and child don't
+    generate the same ids.
+    """
+    def __init__(self, buffer_size=512):
+        self.buffer_size = buffer_size
+        self._format = struct.Struct('<%dQ' % buffer_size)
+        self._locals = threading.local()
+
+    def reseed(self):
+        """Discards all the buffered ids"""
+        _reseed()
+
+    def _refill(self):
+        ids = [i for i in self._format.unpack(os.urandom(self._format.size)) if i]
+        self._locals.ids = ids
+        self._locals.generation = _generation
+        return ids
+
+    def generate_id(self):
+        ids = getattr(self._locals, 'ids', None)
+        if not ids or self._locals.generation != _generation:
+            ids = self._refill()
+        return ids.pop()
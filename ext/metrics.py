@@ -0,0 +1,212 @@
+import sys
+import json
+import threading
+
+
+# durations are stored in microseconds: each power of two is split in
+# 2 ** SUB_BUCKET_BITS linear buckets, so the relative error is ~12%
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_BITS = 36
+MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+OTHER_OPERATIONS = '__other__'
+
+
+def bucket_index(value):
+    """Returns the log-linear bucket of a positive integer value"""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index):
+    """Returns the [lower, upper) values of a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    lower = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return lower, lower + (1 << shift)
+
+
+NUM_BUCKETS = bucket_index(MAX_VALUE) + 1
+
+
+def percentile(buckets, p):
+    """Returns an approximation of the `p` percentile (0 < p <= 1) of
+    the histogram, as the middle value of the bucket that contains it.
+    """
+    total = sum(buckets)
+    if not total:
+        return 0
+
+    rank = max(1, int(total * p + 0.5))
+    for index, count in enumerate(buckets):
+        rank -= count
+        if rank <= 0:
+            lower, upper = bucket_bounds(index)
+            return (lower + upper - 1) // 2
+
+
+class MetricsRecorder():
+    """Recorder stage that aggregates each finished span in RED metrics
+    (rate, errors and duration) for its `operation_name`. Spans are
+    then forwarded to `recorder`, if any, so that this stage can be used
+    alongside or instead of other recorders. Placing it before a
+    `TailSamplingRecorder` gives exact metrics even if most of the
+    traces are dropped.
+
+    Each thread updates its own shard, so no locks are acquired when a
+    span is recorded; shards are merged when metrics are read, and the
+    shards of threads that are no longer alive are folded in a single
+    accumulator. Durations are stored in fixed-size log-linear histograms
+    and at most `max_operations` operations are tracked by each shard:
+    the others are aggregated as `OTHER_OPERATIONS`.
+    """
+    def __init__(self, recorder=None, max_operations=1000):
+        self.recorder = recorder
+        self.max_operations = max_operations
+        self._local = threading.local()
+        # (thread, shard) pairs of the threads that recorded spans
+        self._shards = []
+        self._dead = {}
+        self._lock = threading.Lock()
+        self._last_export = {}
+        self._exporter = None
+
+    @property
+    def keeps_spans(self):
+        # spans are referenced only by the downstream recorder
+        return getattr(self.recorder, 'keeps_spans', False)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._fold()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def record_span(self, span):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+
+        # operation -> [count, errors, buckets]
+        metrics = shard.get(span.operation_name)
+        if metrics is None:
+            name = span.operation_name
+            if len(shard) >= self.max_operations:
+                name = OTHER_OPERATIONS
+            metrics = shard.get(name)
+            if metrics is None:
+                metrics = shard[name] = [0, 0, [0] * NUM_BUCKETS]
+
+        metrics[0] += 1
+        if span.tags.get('error'):
+            metrics[1] += 1
+        value = min(MAX_VALUE, max(0, span.duration_ns // 1000))
+        metrics[2][bucket_index(value)] += 1
+
+        if self.recorder is not None:
+            self.recorder.record_span(span)
+
+    def _add(self, merged, shard):
+        for name, (count, errors, buckets) in list(shard.items()):
+            metrics = merged.get(name)
+            if metrics is None:
+                if len(merged) >= self.max_operations:
+                    name = OTHER_OPERATIONS
+                metrics = merged.get(name)
+            if metrics is None:
+                merged[name] = [count, errors, list(buckets)]
+            else:
+                metrics[0] += count
+                metrics[1] += errors
+                metrics[2] = [a + b for a, b in zip(metrics[2], buckets)]
+
+    def _fold(self):
+        # a thread that is not alive doesn't change its shard anymore, so
+        # it's moved in the accumulator; it must be called with the lock
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._add(self._dead, shard)
+        self._shards = alive
+
+    def _merge(self):
+        with self._lock:
+            self._fold()
+            shards = self._shards
+            merged = {}
+            self._add(merged, self._dead)
+
+        for _, shard in shards:
+            self._add(merged, shard)
+        return merged
+
+    def snapshot(self):
+        """Returns the metrics of each operation since the recorder is
+        created.
+        """
+        return self._format(self._merge(), {})
+
+    def _format(self, merged, since):
+        snapshot = {}
+        for name, (count, errors, buckets) in merged.items():
+            previous = since.get(name)
+            if previous is not None:
+                count -= previous[0]
+                errors -= previous[1]
+                buckets = [a - b for a, b in zip(buckets, previous[2])]
+            if not count:
+                continue
+
+            snapshot[name] = {
+                'count': count,
+                'errors': errors,
+                'p50_us': percentile(buckets, 0.50),
+                'p90_us': percentile(buckets, 0.90),
+                'p99_us': percentile(buckets, 0.99),
+            }
+        return snapshot
+
+    def export(self):
+        """Returns the metrics collected since the previous `export()`"""
+        merged = self._merge()
+        snapshot = self._format(merged, self._last_export)
+        self._last_export = merged
+        return snapshot
+
+    def start_export(self, interval, exporter=None):
+        """Calls `exporter` with the result of `export()` every `interval`
+        seconds, from a background thread. By default the metrics are
+        written in `stderr` as JSON lines.
+        """
+        if self._exporter is not None:
+            return
+
+        if exporter is None:
+            def exporter(snapshot):
+                sys.stderr.write(json.dumps(snapshot, sort_keys=True) + '\n')
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                exporter(self.export())
+
+        self._exporter = (threading.Thread(target=run, name='MetricsRecorder'), stop)
+        self._exporter[0].daemon = True
+        self._exporter[0].start()
+
+    def stop_export(self):
+        if self._exporter is not None:
+            thread, stop = self._exporter
+            stop.set()
+            thread.join()
+            self._exporter = None
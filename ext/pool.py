@@ -0,0 +1,145 @@
+import weakref
+import threading
+import collections
+
+from basictracer.context import SpanContext
+
+
+class _Released(object):
+    """Placeholder of the state of a pooled `Span` or `SpanContext`, that
+    raises when it's used after it has been released.
+    """
+    def _fail(self, *args, **kwargs):
+        raise RuntimeError('Span used after it has been released to the pool')
+
+    def __getattr__(self, name):
+        self._fail()
+
+    __bool__ = __iter__ = __setitem__ = __getitem__ = _fail
+
+
+_RELEASED = _Released()
+
+
+def pin(span):
+    """Returns a reference that prevents a `SpanPool` from recycling
+    `span` while it's alive. It must be held by code that keeps a `Span`
+    to activate it later in another execution unit (i.e. a new thread),
+    because the `Span` may be finished and recorded in the meantime.
+    """
+    if span is None:
+        return None
+    # spans with weak references are never released
+    return weakref.ref(span)
+
+
+class SpanPool(object):
+    """Bounded per-thread free-lists of spans and contexts, used by the
+    `DebugTracer` to recycle them after the recorder has finished with
+    them. Each thread keeps up to `max_size` spans and contexts.
+
+    The tracer releases a `Span` as soon as `record_span()` returns,
+    unless the recorder has a true `keeps_spans` attribute because it
+    references spans after that (i.e. the `BatchingRecorder`, the
+    `TailSamplingRecorder` or the `TraceStore`). Buffering recorders
+    release spans themselves once they're written, if they're created
+    with `release=pool.release_shared`; the others never release them.
+
+    Pooling is safe only when the application doesn't use a `Span` or its
+    `SpanContext` after `finish()`: released objects raise a `RuntimeError`
+    when they're used. Spans still referenced by a restore chain of an
+    ActiveSpanSource or by a `pin()` are not recycled.
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._local = threading.local()
+        # (span, context) pairs released by threads that don't create
+        # spans; `deque` appends and pops are thread-safe
+        self._shared = collections.deque()
+
+    def _free_lists(self):
+        local = self._local
+        local.spans, local.contexts = [], []
+        return local.spans, local.contexts
+
+    def acquire(self, tracer, trace_id, span_id, baggage, operation_name,
+                parent_id, tags, start_time):
+        """Returns an initialized `tracer.span_class` instance, recycling
+        a released one if available.
+        """
+        local = self._local
+        try:
+            spans, contexts = local.spans, local.contexts
+        except AttributeError:
+            spans, contexts = self._free_lists()
+
+        if not spans and self._shared:
+            try:
+                span, context = self._shared.popleft()
+            except IndexError:
+                pass
+            else:
+                spans.append(span)
+                if context is not None:
+                    contexts.append(context)
+
+        if contexts:
+            context = contexts.pop()
+            context.__init__(trace_id=trace_id, span_id=span_id, baggage=baggage)
+        else:
+            context = SpanContext(trace_id=trace_id, span_id=span_id, baggage=baggage)
+
+        span_class = tracer.span_class
+        if spans and type(spans[-1]) is span_class:
+            span = spans.pop()
+            span.__init__(tracer, operation_name, context, parent_id, tags, start_time)
+            return span
+        return span_class(tracer, operation_name, context, parent_id, tags, start_time)
+
+    def release(self, span):
+        """Stores a recorded `Span` and its context for later reuse in
+        the current thread.
+        """
+        if weakref.getweakrefcount(span):
+            # an execution unit may still restore or activate it
+            return
+
+        local = self._local
+        try:
+            spans, contexts = local.spans, local.contexts
+        except AttributeError:
+            spans, contexts = self._free_lists()
+
+        if len(spans) >= self.max_size:
+            return
+
+        context = _clear(span)
+        if context is not None and len(contexts) < self.max_size:
+            contexts.append(context)
+        spans.append(span)
+
+    def release_shared(self, span):
+        """Stores a recorded `Span` and its context for later reuse in any
+        thread. It's meant for threads that don't create spans (i.e. the
+        worker of a `BatchingRecorder`), where `release()` would keep
+        them in a free-list that is never used.
+        """
+        if weakref.getweakrefcount(span) or len(self._shared) >= self.max_size:
+            return
+        self._shared.append((span, _clear(span)))
+
+
+def _clear(span):
+    """Clears the state of a released `Span`, returning its context if it
+    can be reused.
+    """
+    context = span._context
+    if type(context) is SpanContext:
+        context.trace_id = context.span_id = context.sampled = _RELEASED
+        context._baggage = _RELEASED
+    else:
+        context = None
+
+    span._tracer = span._context = span._tags = span._logs = _RELEASED
+    span._to_restore = None
+    return context
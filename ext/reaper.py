@@ -0,0 +1,86 @@
+"""Detection of spans that are activated but never finished, like the
+`some_work` Span of `examples.asyncio.coroutine_with_callbacks()`.
+"""
+import sys
+import weakref
+import threading
+
+from .span import SpanContinuation
+from .active_span_source import LiveSpans
+
+
+def _report(span, age):
+    sys.stderr.write('Span %r is not finished after %.1fs\n' % (span.operation_name, age))
+
+
+class SpanReaper(object):
+    """Checks the `LiveSpans` of the given ActiveSpanSource instances,
+    looking for spans activated more than `max_age` seconds ago and not
+    finished yet. Each one is passed once to `report(span, age)` (by
+    default a message in `stderr`) and, if `finish` is set, it's
+    finished so that it's recorded and released. Forced spans have a
+    `reaper.finished` log; if they're still the ActiveSpan of their
+    execution unit, they stay active until they're released.
+
+    Sources track their live spans only after the reaper is created, so
+    spans activated before are not checked. Continuations of a `Span` in
+    pooled workers are reported but never finished, because they don't
+    own the original `Span`.
+    """
+    def __init__(self, sources, max_age=60.0, finish=False, report=None):
+        self.sources = sources
+        self.max_age = max_age
+        self.finish = finish
+        self.report = report or _report
+
+        # counters available for monitoring
+        self.reported_spans = 0
+        self.finished_spans = 0
+
+        self._reported = weakref.WeakSet()
+        self._reaper = None
+
+        for source in sources:
+            if source.live_spans is None:
+                source.live_spans = LiveSpans()
+
+    def live_spans(self):
+        """Returns the number of live spans of each source"""
+        return {type(source).__name__: len(source.live_spans) for source in self.sources}
+
+    def reap(self):
+        """Checks all sources once"""
+        for source in self.sources:
+            for span, age in source.live_spans.older_than(self.max_age):
+                if span not in self._reported:
+                    self._reported.add(span)
+                    self.reported_spans += 1
+                    self.report(span, age)
+
+                if self.finish and not isinstance(span, SpanContinuation):
+                    source.live_spans.discard(span)
+                    span.log_kv({'event': 'reaper.finished', 'age': age})
+                    span.finish()
+                    self.finished_spans += 1
+
+    def start(self, interval):
+        """Runs `reap()` every `interval` seconds from a background thread"""
+        if self._reaper is not None:
+            return
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.reap()
+
+        self._reaper = (threading.Thread(target=run, name='SpanReaper'), stop)
+        self._reaper[0].daemon = True
+        self._reaper[0].start()
+
+    def stop(self):
+        if self._reaper is not None:
+            thread, stop = self._reaper
+            stop.set()
+            thread.join()
+            self._reaper = None
@@ -1,3 +1,29 @@
+import sys
+import time
+import atexit
+import threading
+import collections
+
+from .clock import format_ns
+
+
+def format_span(span):
+    """Return a human readable version of the Span"""
+    lines = [
+        ('name', span.operation_name),
+        ('id', span._context.span_id),
+        ('trace_id', span._context.trace_id),
+        ('parent_id', span.parent_id),
+        ('start', format_ns(span.start_time_ns)),
+        ('end', '' if span.duration_ns < 0 else format_ns(span.start_time_ns + span.duration_ns)),
+        ('duration', '%ss' % format_ns(max(span.duration_ns, 0))),
+        ('tags', '')
+    ]
+
+    lines.extend((' ', '%s:%s' % kv) for kv in sorted(span.tags.items()))
+    return '\n'.join(['=' * 10] + ['%10s %s' % l for l in lines])
+
+
 class LogRecorder():
     """Recorder implementation that logs in the stdout a pretty
     printed representation of the recorded `Span`. This is used
@@ -6,19 +32,272 @@ class LogRecorder():
     """
 
     def record_span(self, span):
-        """Return a human readable version of the Span"""
-
-        lines = [
-            ('name', span.operation_name),
-            ('id', span._context.span_id),
-            ('trace_id', span._context.trace_id),
-            ('parent_id', span.parent_id),
-            ('start', span.start_time),
-            ('end', '' if not span.duration else span.start_time + span.duration),
-            ('duration', '%fs' % (span.duration or 0)),
-            ('tags', '')
-        ]
-
-        lines.extend((' ', '%s:%s' % kv) for kv in sorted(span.tags.items()))
-        print('=' * 10)
-        print('\n'.join('%10s %s' % l for l in lines))
+        print(format_span(span))
+
+
+class BatchingRecorder():
+    """Recorder implementation that doesn't write in the thread that
+    finishes the `Span`. Recorded spans are appended in a bounded buffer
+    and a background worker serializes and writes them in batches when
+    `max_batch_size` spans are queued, when the oldest span waited for
+    `flush_interval` seconds or when the recorder is closed.
+
+    When the buffer is full, new spans are dropped if `drop_on_full` is
+    set, otherwise the caller waits until the worker frees some space.
+    The recorder is closed automatically when the interpreter exits.
+
+    Spans are written as text, unless an `encoder` is given (i.e. a
+    `SpanEncoder`): in that case `stream` must accept bytes. Errors
+    raised while writing are reported in the stderr and the batch is
+    counted in `failed_spans`, without stopping the worker.
+
+    Spans are referenced until they're written, so a `DebugTracer` never
+    releases them to its `SpanPool`: pass `release=pool.release_shared` to
+    recycle each `Span` once it has been written, dropped or failed.
+    """
+    keeps_spans = True
+
+    def __init__(self, stream=None, max_queue_size=4096, max_batch_size=512,
+                 flush_interval=1.0, drop_on_full=True, encoder=None, release=None):
+        self.stream = stream or sys.stdout
+        self.encoder = encoder
+        self.release = release
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.drop_on_full = drop_on_full
+
+        # counters available for monitoring
+        self.dropped_spans = 0
+        self.flushed_spans = 0
+        self.failed_spans = 0
+
+        # `deque.append()` and `deque.popleft()` are thread-safe, so the
+        # lock is used only when the buffer is full
+        self._spans = collections.deque()
+        self._not_full = threading.Condition(threading.Lock())
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name='BatchingRecorder')
+        self._worker.daemon = True
+        self._worker.start()
+        atexit.register(self.close)
+
+    @property
+    def queued_spans(self):
+        """Returns the number of spans waiting to be flushed"""
+        return len(self._spans)
+
+    def record_span(self, span):
+        if self._closed:
+            self._drop(span)
+            return
+
+        if len(self._spans) >= self.max_queue_size:
+            with self._not_full:
+                if self.drop_on_full:
+                    self._drop(span)
+                    return
+
+                while len(self._spans) >= self.max_queue_size and not self._closed:
+                    self._wakeup.set()
+                    self._not_full.wait()
+
+        self._spans.append(span)
+        if len(self._spans) >= self.max_batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Serializes and writes all spans that are waiting in the buffer.
+        It's called by the background worker, but it's safe to call it
+        from other threads.
+        """
+        while self._spans:
+            batch = []
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self._spans.popleft())
+            except IndexError:
+                pass
+
+            with self._not_full:
+                self._not_full.notify_all()
+
+            if not batch:
+                continue
+
+            try:
+                written = self._write(batch)
+            except Exception as e:
+                self.failed_spans += len(batch)
+                sys.stderr.write('%s failed to write %d spans: %r\n' % (
+                    type(self).__name__, len(batch), e))
+            else:
+                if written is True:
+                    written = len(batch)
+                self.flushed_spans += written
+                self.dropped_spans += len(batch) - written
+
+            if self.release is not None:
+                for span in batch:
+                    self.release(span)
+
+    def _drop(self, span):
+        self.dropped_spans += 1
+        if self.release is not None:
+            self.release(span)
+
+    def _write(self, batch):
+        """Writes a batch of spans, returning `False` if they have been
+        dropped, or the number of spans written if only some of them have
+        been. Subclasses can override it to use other transports.
+        """
+        with self._write_lock:
+            if self.encoder is None:
+                self.stream.write('\n'.join(format_span(span) for span in batch) + '\n')
+            else:
+                try:
+                    for span in batch:
+                        self.encoder.encode(span)
+                    self.stream.write(self.encoder.take())
+                except Exception:
+                    # the reader may have missed interned strings
+                    del self.encoder.buffer[:]
+                    self.encoder.reset()
+                    raise
+            self.stream.flush()
+        return True
+
+    def close(self):
+        """Stops the background worker, writing all queued spans. Spans
+        recorded after this call are dropped.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._wakeup.set()
+        self._worker.join()
+        with self._not_full:
+            self._not_full.notify_all()
+
+        # the exit handler keeps the recorder alive
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+        # write what is left after the shutdown
+        self.flush()
+
+
+class TailSamplingRecorder():
+    """Recorder stage that buffers finished spans grouped by trace,
+    until the local root `Span` (the one without a `parent_id`) is
+    finished. Then the trace is checked against the `rules` and all its
+    spans are forwarded to `recorder` if at least one rule keeps it,
+    otherwise they're dropped. Spans of a trace that are finished after
+    the root follow the same decision.
+
+    At most `max_spans` spans are buffered: when the limit is reached
+    the oldest traces are evicted. Traces without a finished root (i.e.
+    a `Span` that is never finished) are evicted after `max_age` seconds,
+    when a span is recorded or `flush()` is called, and all of them when
+    the recorder is closed. Buffered spans are never released to a
+    `SpanPool`.
+    """
+    keeps_spans = True
+
+    def __init__(self, recorder, rules, max_spans=10000, max_age=60.0,
+                 max_decisions=1024):
+        self.recorder = recorder
+        self.rules = rules
+        self.max_spans = max_spans
+        self.max_age = max_age
+        self.max_decisions = max_decisions
+
+        # counters available for monitoring
+        self.buffered_spans = 0
+        self.kept_traces = 0
+        self.dropped_traces = 0
+        self.evicted_traces = 0
+        self.evicted_spans = 0
+
+        # trace_id -> (first seen time, spans) in arrival order
+        self._traces = collections.OrderedDict()
+        # trace_id -> decision taken for recently finished traces
+        self._decisions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_span(self, span):
+        trace_id = span._context.trace_id
+        now = time.monotonic()
+
+        with self._lock:
+            decision = self._decisions.get(trace_id)
+            if decision is None:
+                trace = self._traces.get(trace_id)
+                if trace is None:
+                    trace = self._traces[trace_id] = (now, [])
+                trace[1].append(span)
+                self.buffered_spans += 1
+
+                if span.parent_id is None:
+                    spans = self._traces.pop(trace_id)[1]
+                    self.buffered_spans -= len(spans)
+                    decision = any(rule.keep(span, spans) for rule in self.rules)
+                    self._decide(trace_id, decision)
+                    if not decision:
+                        spans = []
+                else:
+                    spans = []
+
+                self._evict(now)
+            else:
+                spans = [span] if decision else []
+
+        for span in spans:
+            self.recorder.record_span(span)
+
+    def flush(self):
+        """Evicts the traces buffered for more than `max_age` seconds.
+        It's done when spans are recorded, so it's needed only when
+        the tracer may stay idle for a while.
+        """
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def close(self):
+        """Evicts all the buffered traces, since their root `Span` is not
+        going to be recorded. The wrapped `recorder` is not closed.
+        """
+        with self._lock:
+            # every trace is older than an infinite time
+            self._evict(float('inf'))
+
+    def _decide(self, trace_id, decision):
+        if decision:
+            self.kept_traces += 1
+        else:
+            self.dropped_traces += 1
+
+        self._decisions[trace_id] = decision
+        if len(self._decisions) > self.max_decisions:
+            self._decisions.popitem(last=False)
+
+    def _evict(self, now):
+        # the oldest traces are the first ones in the buffer
+        while self._traces:
+            trace_id, (first_seen, spans) = next(iter(self._traces.items()))
+            if self.buffered_spans <= self.max_spans and now - first_seen < self.max_age:
+                break
+
+            del self._traces[trace_id]
+            self.buffered_spans -= len(spans)
+            self.evicted_traces += 1
+            self.evicted_spans += len(spans)
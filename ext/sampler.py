@@ -0,0 +1,285 @@
+import time
+import threading
+
+from . import clock
+from .metrics import OTHER_OPERATIONS
+
+
+class Sampler(object):
+    """Sampler decides if a new trace must be recorded. The decision is
+    taken only when a root `Span` is created and it's inherited by all
+    the `Span` of the same trace.
+    """
+    def sampled(self, trace_id, operation_name=None):
+        """Returns `True` if the trace must be recorded.
+        :param trace_id: the id of the new trace
+        :param operation_name: the operation name of the root `Span`
+        """
+        raise NotImplementedError
+
+
+class ConstSampler(Sampler):
+    """Sampler that takes always the same decision."""
+    def __init__(self, decision):
+        self.decision = decision
+
+    def sampled(self, trace_id, operation_name=None):
+        return self.decision
+
+
+class ProbabilisticSampler(Sampler):
+    """Sampler that records a trace with the given `rate` probability.
+    The decision depends only on the `trace_id`, so it's consistent for
+    the same trace.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self._boundary = int(rate * 2 ** 64)
+
+    def sampled(self, trace_id, operation_name=None):
+        return trace_id < self._boundary
+
+
+class RateLimitingSampler(Sampler):
+    """Sampler that records at most `max_traces_per_second` traces,
+    using a token bucket that is refilled while time passes.
+    """
+    def __init__(self, max_traces_per_second):
+        self.max_traces_per_second = max_traces_per_second
+        self._balance = max_traces_per_second
+        self._last_tick = time.monotonic()
+        self._lock = threading.Lock()
+
+    def sampled(self, trace_id, operation_name=None):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_tick
+            self._last_tick = now
+            self._balance = min(
+                self._balance + elapsed * self.max_traces_per_second,
+                self.max_traces_per_second,
+            )
+
+            if self._balance < 1:
+                return False
+
+            self._balance -= 1
+            return True
+
+
+class PerOperationSampler(Sampler):
+    """Sampler that delegates the decision to a different `Sampler` for
+    each operation name, using the `default` one for unknown operations.
+    """
+    def __init__(self, samplers, default):
+        self.samplers = samplers
+        self.default = default
+
+    def sampled(self, trace_id, operation_name=None):
+        sampler = self.samplers.get(operation_name, self.default)
+        return sampler.sampled(trace_id, operation_name)
+
+
+class _OperationRate(object):
+    """Sliding window state of an operation for the `AdaptiveSampler`"""
+    __slots__ = ('counts', 'boundary', 'last_sampled', 'created', 'last_tick',
+                 'warmup', 'warmup_sampled')
+
+    def __init__(self, buckets, now, tick, warmup):
+        self.counts = [0] * buckets
+        self.boundary = 0
+        self.last_sampled = None
+        self.created = now
+        self.last_tick = tick
+        # until a bucket is measured, traces are sampled at the `warmup`
+        # rate instead of using a probability
+        self.warmup = warmup
+        self.warmup_sampled = 0
+
+
+class AdaptiveSampler(Sampler):
+    """Sampler that adjusts the probability of each root operation, so
+    that `target_traces_per_second` traces are recorded in total. The
+    arrival rate of each operation is measured in a sliding window of
+    `window` seconds, split in `buckets`; when a bucket is completed the
+    target is shared between operations, giving to the rare ones all
+    the traces they need and splitting the rest between the others.
+    Rates are measured on the part of the window where the operation
+    has been seen, so recent operations are not underestimated.
+
+    A new operation is sampled at its share of the target (the target
+    divided by the number of operations) until a whole bucket has been
+    measured for it. Regardless of the probability, an operation is
+    sampled if it has not been recorded for `1 / min_traces_per_second`
+    seconds.
+
+    At most `max_operations` operations are tracked; the following ones
+    share the state of the `OTHER_OPERATIONS` entry. Operations that are
+    not seen for `idle_windows` windows are forgotten. Like the
+    `ProbabilisticSampler`, the decision depends on the `trace_id`.
+    """
+    def __init__(self, target_traces_per_second, min_traces_per_second=0.1,
+                 window=10.0, buckets=10, max_operations=1000, idle_windows=3):
+        self.target_traces_per_second = target_traces_per_second
+        self.min_interval = 1.0 / min_traces_per_second if min_traces_per_second else None
+        self.window = window
+        self.buckets = buckets
+        self.max_operations = max_operations
+        self.idle_windows = idle_windows
+
+        self._bucket_width = window / buckets
+        self._tick = int(self._now() / self._bucket_width)
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now():
+        return clock.now() / 1e9
+
+    def probabilities(self):
+        """Returns the current probability of each operation; operations
+        that are warming up have a `None` probability.
+        """
+        with self._lock:
+            return {
+                name: None if state.warmup is not None else state.boundary / 2 ** 64
+                for name, state in self._operations.items()
+            }
+
+    def sampled(self, trace_id, operation_name=None):
+        with self._lock:
+            now = self._now()
+            tick = int(now / self._bucket_width)
+            if tick != self._tick:
+                self._advance(tick)
+
+            state = self._operations.get(operation_name)
+            if state is None:
+                if len(self._operations) >= self.max_operations:
+                    operation_name = OTHER_OPERATIONS
+                    state = self._operations.get(operation_name)
+                if state is None:
+                    state = self._add(operation_name, now, tick)
+            state.counts[tick % self.buckets] += 1
+            state.last_tick = tick
+
+            if state.warmup is not None:
+                # at most one trace more than the seeded rate allows
+                decision = state.warmup_sampled < state.warmup * (now - state.created) + 1
+                if decision:
+                    state.warmup_sampled += 1
+            else:
+                decision = trace_id < state.boundary
+
+            if decision or (
+                    self.min_interval is not None and
+                    (state.last_sampled is None or now - state.last_sampled >= self.min_interval)):
+                state.last_sampled = now
+                return True
+            return False
+
+    def _add(self, operation_name, now, tick):
+        # the other operations that are warming up lower their rate to the
+        # same share, so that all together they stay within the target
+        share = self.target_traces_per_second / (len(self._operations) + 1)
+        for state in self._operations.values():
+            if state.warmup is not None and state.warmup > share:
+                state.warmup = share
+        state = self._operations[operation_name] = _OperationRate(
+            self.buckets, now, tick, share)
+        return state
+
+    def _advance(self, tick):
+        # clear the buckets that are entering the window
+        for passed in range(self._tick + 1, min(tick, self._tick + self.buckets) + 1):
+            bucket = passed % self.buckets
+            for state in self._operations.values():
+                state.counts[bucket] = 0
+        self._tick = tick
+
+        # forget idle operations
+        max_idle = self.idle_windows * self.buckets
+        for name in [name for name, state in self._operations.items()
+                     if tick - state.last_tick >= max_idle]:
+            del self._operations[name]
+
+        # the current bucket is empty, so it's not included in the window;
+        # operations seen for less than a bucket keep their warm-up rate
+        end = tick * self._bucket_width
+        start = end - (self.window - self._bucket_width)
+        remaining = self.target_traces_per_second
+        rates = []
+        for state in self._operations.values():
+            elapsed = end - max(start, state.created)
+            if elapsed < self._bucket_width:
+                remaining -= state.warmup
+            else:
+                state.warmup = None
+                rates.append((sum(state.counts) / elapsed, state))
+
+        # share the target between operations, from the rarest one
+        rates.sort(key=lambda item: item[0])
+        remaining = max(remaining, 0)
+        for position, (rate, state) in enumerate(rates):
+            share = remaining / (len(rates) - position)
+            if rate <= share:
+                state.boundary = 2 ** 64
+                remaining -= rate
+            else:
+                state.boundary = int(share / rate * 2 ** 64)
+                remaining -= share
+
+
+class TraceRule(object):
+    """TraceRule decides if a finished trace must be kept. It's used by
+    the `TailSamplingRecorder` when the local root `Span` is finished.
+    """
+    def keep(self, root, spans):
+        """Returns `True` if the trace must be kept.
+        :param root: the local root `Span` of the trace
+        :param spans: all the finished spans of the trace, root included
+        """
+        raise NotImplementedError
+
+
+class SlowTraceRule(TraceRule):
+    """Keeps traces where the root `Span` lasted at least `threshold`
+    seconds.
+    """
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def keep(self, root, spans):
+        return root.duration >= self.threshold
+
+
+class ErrorTraceRule(TraceRule):
+    """Keeps traces where at least one `Span` has the `error` tag."""
+    def keep(self, root, spans):
+        return any(span.tags.get('error') for span in spans)
+
+
+class OperationQuotaRule(TraceRule):
+    """Keeps at most `quota` traces every `interval` seconds for each
+    operation name of the root `Span`.
+    """
+    def __init__(self, quota, interval=1.0):
+        self.quota = quota
+        self.interval = interval
+        self._window = time.monotonic()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def keep(self, root, spans):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window >= self.interval:
+                self._window = now
+                self._counts.clear()
+
+            count = self._counts.get(root.operation_name, 0)
+            if count >= self.quota:
+                return False
+
+            self._counts[root.operation_name] = count + 1
+            return True
@@ -1,9 +1,430 @@
+import threading
+
+from opentracing.ext import tags as ext_tags
 from proposal import Span as ProposalMixin
 
-from basictracer.span import BasicSpan
+from basictracer.span import BasicSpan, LogData
+
+from . import clock
+
+
+class _Buffer(list):
+    """Append-only buffer of tags (flat `key, value` sequence) or logs
+    (`(key_values, timestamp)` tuples, with monotonic timestamps of the
+    `clock`) not yet read by anyone.
+    """
+    __slots__ = ()
+
+
+def _tags_dict(buffer):
+    """Materializes buffered tags; later values override previous ones"""
+    if buffer is None:
+        return {}
+    items = iter(buffer)
+    return dict(zip(items, items))
+
+
+def _mapping(tags):
+    """Tags given to a constructor; tags are then set in place, so
+    mappings that are not a dict (i.e. read-only ones) are copied.
+    """
+    if not tags:
+        return None
+    return tags if isinstance(tags, dict) else dict(tags)
+
+
+def _logs_list(buffer):
+    """Materializes buffered logs as `LogData`"""
+    if buffer is None:
+        return []
+    return [LogData(key_values, clock.to_wall(timestamp)) for key_values, timestamp in buffer]
+
+
+def _logs_ns(logs):
+    """Logs as `(key_values, timestamp)` tuples with unix time in
+    nanoseconds; buffered logs are converted without going through
+    seconds.
+    """
+    if logs is None:
+        return []
+    if type(logs) is _Buffer:
+        return [(key_values, clock.to_wall_ns(timestamp)) for key_values, timestamp in logs]
+    return [(log.key_values, int(round(log.timestamp * 1000000000))) for log in logs]
+
+
+class _Timing(object):
+    """Start and end of a `Span`, stored as monotonic nanoseconds of the
+    `clock` in `_start` and `_end`. The OpenTracing `start_time` and
+    `duration` (in seconds) and their nanoseconds versions used by
+    exporters are derived only when they're read; the same goes for
+    log timestamps in `logs_ns`.
+    """
+    __slots__ = ()
+
+    @property
+    def start_time(self):
+        return clock.to_wall(self._start)
+
+    @start_time.setter
+    def start_time(self, start_time):
+        self._start = clock.now() if start_time is None else clock.from_wall(start_time)
+
+    @property
+    def start_time_ns(self):
+        return clock.to_wall_ns(self._start)
+
+    @property
+    def duration(self):
+        end = self._end
+        return -1 if end is None else (end - self._start) / 1e9
+
+    @duration.setter
+    def duration(self, duration):
+        self._end = None if duration < 0 else self._start + int(round(duration * 1000000000))
+
+    @property
+    def duration_ns(self):
+        end = self._end
+        return -1 if end is None else end - self._start
 
+    @property
+    def logs_ns(self):
+        return _logs_ns(self._logs)
 
-class Span(ProposalMixin, BasicSpan):
+
+class Span(_Timing, ProposalMixin, BasicSpan):
     """Class that extends the BasicSpan reference implementation
-    with the proposal API"""
-    pass
+    with the proposal API. Tags and logs are buffered when they're set
+    and converted in a dict and `LogData` only when they're read (i.e.
+    when a recorder serializes the `Span`), so spans dropped before
+    that never pay for it. Timings are taken with the `clock`.
+    """
+    # read without the lock because recorders are called while finish()
+    # holds it
+    @property
+    def tags(self):
+        tags = self._tags
+        if tags is None or type(tags) is _Buffer:
+            tags = self._tags = _tags_dict(tags)
+        return tags
+
+    @tags.setter
+    def tags(self, tags):
+        self._tags = _mapping(tags)
+
+    @property
+    def logs(self):
+        logs = self._logs
+        if logs is None or type(logs) is _Buffer:
+            logs = self._logs = _logs_list(logs)
+        return logs
+
+    @logs.setter
+    def logs(self, logs):
+        self._logs = list(logs) if logs else None
+
+    def set_tag(self, key, value):
+        with self._lock:
+            if key == ext_tags.SAMPLING_PRIORITY:
+                self._context.sampled = value > 0
+
+            tags = self._tags
+            if tags is None:
+                tags = self._tags = _Buffer()
+            if type(tags) is _Buffer:
+                tags.extend((key, value))
+            else:
+                tags[key] = value
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        timestamp = clock.now() if timestamp is None else clock.from_wall(timestamp)
+        with self._lock:
+            logs = self._logs
+            if logs is None:
+                logs = self._logs = _Buffer()
+            if type(logs) is _Buffer:
+                logs.append((key_values, timestamp))
+            else:
+                logs.append(LogData(key_values, clock.to_wall(timestamp)))
+        return self
+
+    def finish(self, finish_time=None):
+        if self._deactivate_on_finish and self._tracer:
+            self._tracer.active_span_source.deactivate(self)
+
+        with self._lock:
+            self._end = clock.now() if finish_time is None else clock.from_wall(finish_time)
+            self._tracer.record(self)
+
+
+class NonRecordingSpan(ProposalMixin):
+    """Span used for traces that are not sampled. It can be activated
+    and deactivated like any other `Span`, so that the parenting is
+    preserved, but tags, logs and timings are discarded and it's never
+    recorded. All spans of a trace share the root `SpanContext`, until
+    a baggage item is set: baggage is propagated like in a recorded
+    `Span`, copying the context on write.
+    """
+    def __init__(self, tracer, context):
+        # skip the constructors chain because there isn't any other state
+        self._tracer = tracer
+        self._context = context
+        self._deactivate_on_finish = False
+
+    def set_baggage_item(self, key, value):
+        self._context = self._context.with_baggage_item(key, value)
+        return self
+
+    def get_baggage_item(self, key):
+        return self._context.baggage.get(key)
+
+    def finish(self, finish_time=None):
+        # nothing to record: only the deactivation is left
+        if self._deactivate_on_finish:
+            self._tracer._active_span_source.deactivate(self)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finish()
+
+
+class SpanContinuation(object):
+    """Activation of a `Span` in another execution unit (i.e. a pooled
+    worker). The ActiveSpanSource stores the restore link in the
+    activated object, so activating the original `Span` in more workers
+    would overwrite the link used by the execution that owns it. The
+    continuation has its own link and delegates everything else to the
+    original `Span`.
+    """
+    __slots__ = ('_span', '_to_restore', '_deactivate_on_finish', '__weakref__')
+
+    def __init__(self, span):
+        self._span = span
+        self._to_restore = None
+        self._deactivate_on_finish = False
+
+    def __getattr__(self, name):
+        return getattr(self._span, name)
+
+    def _deactivate(self):
+        if self._deactivate_on_finish:
+            self._span.tracer.active_span_source.deactivate(self)
+
+    def finish(self, finish_time=None):
+        self._deactivate()
+        self._span.finish(finish_time=finish_time)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._deactivate()
+        self._span.__exit__(exc_type, exc_val, exc_tb)
+
+
+# shared empty containers returned when a CompactSpan doesn't have tags
+# or logs; they must not be changed
+_EMPTY_TAGS = {}
+_EMPTY_LOGS = ()
+
+# used only when the first tag or log of a CompactSpan is set
+_lazy_lock = threading.Lock()
+
+
+class CompactSpan(_Timing):
+    """Span implementation with the same API of `Span` that uses
+    `__slots__` instead of an instance `__dict__`, so that it's cheaper
+    to keep thousands of spans in flight. The tags and logs containers
+    are created only when the first tag or log is added and, like in
+    `Span`, they're materialized only when read.
+
+    It doesn't extend the OpenTracing `Span` because its base classes
+    don't define `__slots__`.
+    """
+    __slots__ = (
+        '_tracer',
+        '_context',
+        '_tags',
+        '_logs',
+        '_to_restore',
+        '_deactivate_on_finish',
+        'operation_name',
+        'parent_id',
+        '_start',
+        '_end',
+        # referenced weakly by the restore chain of the ActiveSpanSource
+        '__weakref__',
+    )
+
+    def __init__(self, tracer, operation_name=None, context=None,
+                 parent_id=None, tags=None, start_time=None):
+        self._tracer = tracer
+        self._context = context
+        self._tags = _mapping(tags)
+        self._logs = None
+        self._to_restore = None
+        self._deactivate_on_finish = False
+        self.operation_name = operation_name
+        self.parent_id = parent_id
+        self._start = clock.now() if start_time is None else clock.from_wall(start_time)
+        self._end = None
+
+    @property
+    def context(self):
+        return self._context
+
+    @property
+    def tracer(self):
+        return self._tracer
+
+    @property
+    def tags(self):
+        tags = self._tags
+        if tags is None:
+            return _EMPTY_TAGS
+        if type(tags) is _Buffer:
+            tags = self._tags = _tags_dict(tags)
+        return tags
+
+    @property
+    def logs(self):
+        logs = self._logs
+        if logs is None:
+            return _EMPTY_LOGS
+        if type(logs) is _Buffer:
+            logs = self._logs = _logs_list(logs)
+        return logs
+
+    def set_operation_name(self, operation_name):
+        self.operation_name = operation_name
+        return self
+
+    def set_tag(self, key, value):
+        if key == ext_tags.SAMPLING_PRIORITY:
+            self._context.sampled = value > 0
+
+        if self._tags is None:
+            with _lazy_lock:
+                if self._tags is None:
+                    self._tags = _Buffer()
+
+        # a single extend() keeps the pair together across threads
+        tags = self._tags
+        if type(tags) is _Buffer:
+            tags.extend((key, value))
+        else:
+            tags[key] = value
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        timestamp = clock.now() if timestamp is None else clock.from_wall(timestamp)
+        if self._logs is None:
+            with _lazy_lock:
+                if self._logs is None:
+                    self._logs = _Buffer()
+
+        logs = self._logs
+        if type(logs) is _Buffer:
+            logs.append((key_values, timestamp))
+        else:
+            logs.append(LogData(key_values, clock.to_wall(timestamp)))
+        return self
+
+    def log_event(self, event, payload=None):
+        if payload is None:
+            return self.log_kv({'event': event})
+        return self.log_kv({'event': event, 'payload': payload})
+
+    def finish(self, finish_time=None):
+        if self._deactivate_on_finish and self._tracer:
+            self._tracer.active_span_source.deactivate(self)
+
+        self._end = clock.now() if finish_time is None else clock.from_wall(finish_time)
+        self._tracer.record(self)
+
+    def set_baggage_item(self, key, value):
+        self._context = self._context.with_baggage_item(key, value)
+        return self
+
+    def get_baggage_item(self, key):
+        return self._context.baggage.get(key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.log_kv({
+                'python.exception.type': exc_type,
+                'python.exception.val': exc_val,
+                'python.exception.tb': exc_tb,
+            })
+        self.finish()
+
+
+class FinishedSpan(object):
+    """Snapshot of a finished `Span` with only the attributes used by
+    recorders. It can be pickled, so it's used to move spans between
+    processes; log values are converted to strings when they're not
+    simple types (i.e. tracebacks logged when an exception is raised).
+    Timings are kept as unix time and duration in nanoseconds, and so
+    are log timestamps in `logs_ns`; `logs` converts them to `LogData`.
+    """
+    __slots__ = (
+        '_context',
+        'operation_name',
+        'parent_id',
+        'start_time_ns',
+        'duration_ns',
+        'tags',
+        'logs_ns',
+    )
+
+    def __init__(self, operation_name, context, parent_id, start_time_ns,
+                 duration_ns, tags, logs_ns):
+        self._context = context
+        self.operation_name = operation_name
+        self.parent_id = parent_id
+        self.start_time_ns = start_time_ns
+        self.duration_ns = duration_ns
+        self.tags = tags
+        self.logs_ns = logs_ns
+
+    @property
+    def context(self):
+        return self._context
+
+    @property
+    def start_time(self):
+        return self.start_time_ns / 1e9
+
+    @property
+    def duration(self):
+        duration = self.duration_ns
+        return -1 if duration < 0 else duration / 1e9
+
+    @property
+    def logs(self):
+        return [LogData(key_values, timestamp / 1e9) for key_values, timestamp in self.logs_ns]
+
+    @classmethod
+    def from_span(cls, span):
+        logs = [
+            ({k: _portable(v) for k, v in key_values.items()}, timestamp)
+            for key_values, timestamp in span.logs_ns
+        ]
+        return cls(
+            span.operation_name,
+            span.context,
+            span.parent_id,
+            span.start_time_ns,
+            span.duration_ns,
+            dict(span.tags),
+            logs,
+        )
+
+
+def _portable(value):
+    if value is None or isinstance(value, (str, bytes, int, float, bool)):
+        return value
+    return str(value)
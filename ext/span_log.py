@@ -0,0 +1,236 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import mmap
+import queue
+import struct
+import threading
+
+from .encoding import SpanEncoder, SpanDecoder
+
+
+# each segment starts with the number of bytes written after the header
+_HEADER = struct.Struct('<Q')
+
+
+class _Segment(object):
+    """Segment file mapped in memory, with its index of trace ids and
+    time range. Spans of a segment are encoded with their own encoder,
+    so each segment can be decoded alone.
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.position = _HEADER.size
+        self.encoder = SpanEncoder()
+        self.trace_ids = set()
+        self.start = None
+        self.end = None
+
+        with open(path, 'w+b') as f:
+            f.truncate(size)
+            self.mmap = mmap.mmap(f.fileno(), size)
+
+    def append(self, data, span):
+        """Copies `data` in the segment, returns `False` if it's full"""
+        end = self.position + len(data)
+        if end > self.size:
+            return False
+
+        self.mmap[self.position:end] = data
+        self.position = end
+        _HEADER.pack_into(self.mmap, 0, end - _HEADER.size)
+
+        # update the index
+        finish = span.start_time + max(span.duration, 0)
+        self.trace_ids.add(span._context.trace_id)
+        self.start = span.start_time if self.start is None else min(self.start, span.start_time)
+        self.end = finish if self.end is None else max(self.end, finish)
+        return True
+
+    def close(self):
+        self.mmap.flush()
+        self.mmap.close()
+        index = {
+            'trace_ids': sorted(self.trace_ids),
+            'start': self.start,
+            'end': self.end,
+        }
+        with open(_index_path(self.path), 'w') as f:
+            json.dump(index, f)
+
+
+def _index_path(path):
+    return path[:-len('.log')] + '.idx'
+
+
+class SegmentLogRecorder(object):
+    """Recorder that persists every finished `Span` in a local append-only
+    log, using the `SpanEncoder` binary format. Spans are copied in
+    `segment_size` files mapped in memory, so that recording doesn't need
+    a syscall per span; when a segment is full a new one is created.
+
+    When a segment is closed, an index with its trace ids and time range
+    is written next to it and, if `compress` is set, the segment data is
+    compressed with gzip by a background thread. It's safe to record
+    spans from multiple threads. Spans that don't fit in an empty segment
+    are dropped and counted in `dropped_spans`.
+    """
+    def __init__(self, directory, segment_size=4 * 1024 * 1024, compress=True, prefix='spans'):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compress = compress
+        self.prefix = prefix
+
+        # counters available for monitoring
+        self.dropped_spans = 0
+
+        os.makedirs(directory, exist_ok=True)
+        existing = _segment_numbers(directory, prefix)
+        self._next_number = max(existing) + 1 if existing else 0
+        self._lock = threading.Lock()
+        self._segment = self._new_segment()
+
+        self._compressions = queue.Queue()
+        self._compressor = threading.Thread(target=self._run_compressor, name='SegmentLogCompressor')
+        self._compressor.daemon = True
+        self._compressor.start()
+
+    def _new_segment(self):
+        path = os.path.join(self.directory, '%s-%08d.log' % (self.prefix, self._next_number))
+        self._next_number += 1
+        return _Segment(path, self.segment_size)
+
+    def record_span(self, span):
+        with self._lock:
+            segment = self._segment
+            segment.encoder.encode(span)
+            data = segment.encoder.take()
+            if segment.append(data, span):
+                return
+
+            # the segment is full: the Span is encoded again with an empty
+            # strings table, that is used by the new segment if it fits
+            encoder = SpanEncoder()
+            encoder.encode(span)
+            data = encoder.take()
+            if _HEADER.size + len(data) > self.segment_size:
+                # strings interned for the dropped Span are not written
+                segment.encoder.reset()
+                self.dropped_spans += 1
+                if self.dropped_spans == 1:
+                    sys.stderr.write('SegmentLogRecorder dropped a span of %d bytes, larger '
+                                     'than segment_size\n' % len(data))
+                return
+
+            self._rotate()
+            segment = self._segment
+            segment.encoder = encoder
+            segment.append(data, span)
+
+    def _rotate(self):
+        closed = self._segment
+        closed.close()
+        self._segment = self._new_segment()
+        if self.compress:
+            self._compressions.put(closed.path)
+
+    def close(self):
+        """Closes the current segment and waits for the compression of
+        all closed segments.
+        """
+        with self._lock:
+            self._segment.close()
+            if self.compress:
+                self._compressions.put(self._segment.path)
+            self._compressions.put(None)
+        self._compressor.join()
+
+    def _run_compressor(self):
+        while True:
+            path = self._compressions.get()
+            if path is None:
+                return
+
+            # readers must never find a partially written file
+            data = _read_segment(path)
+            with gzip.open(path + '.gz.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.gz.tmp', path + '.gz')
+            os.remove(path)
+
+
+def _segment_numbers(directory, prefix):
+    pattern = os.path.join(directory, '%s-*.idx' % prefix)
+    paths = glob.glob(pattern) + glob.glob(pattern[:-len('.idx')] + '.log')
+    return [int(os.path.basename(p).split('-')[-1].split('.')[0]) for p in paths]
+
+
+def _read_segment(path):
+    """Returns the encoded spans of a segment"""
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+
+    with open(path, 'rb') as f:
+        used = _HEADER.unpack(f.read(_HEADER.size))[0]
+        return f.read(used)
+
+
+class SegmentLogReader(object):
+    """Reads the spans persisted by a `SegmentLogRecorder`, using the
+    segment indexes to decode only the segments that may contain the
+    requested trace or time range. Segments without an index (i.e. the
+    one that is still written) are always decoded.
+    """
+    def __init__(self, directory, prefix='spans'):
+        self.directory = directory
+        self.prefix = prefix
+
+    def segments(self):
+        """Returns a list of `(path, index)` sorted by segment; the index
+        is `None` if the segment is not closed yet.
+        """
+        segments = []
+        for number in sorted(set(_segment_numbers(self.directory, self.prefix))):
+            base = os.path.join(self.directory, '%s-%08d' % (self.prefix, number))
+            path = base + '.log.gz' if os.path.exists(base + '.log.gz') else base + '.log'
+            if not os.path.exists(path):
+                continue
+
+            index = None
+            if os.path.exists(base + '.idx'):
+                with open(base + '.idx') as f:
+                    index = json.load(f)
+            segments.append((path, index))
+        return segments
+
+    def _decode(self, path):
+        return SpanDecoder().feed(_read_segment(path))
+
+    def find_trace(self, trace_id):
+        """Returns all the spans of the given trace"""
+        spans = []
+        for path, index in self.segments():
+            if index is not None and trace_id not in index['trace_ids']:
+                continue
+            spans.extend(s for s in self._decode(path) if s.context.trace_id == trace_id)
+        return spans
+
+    def spans(self, start=None, end=None):
+        """Yields the spans that overlap the given time range, in seconds"""
+        for path, index in self.segments():
+            if index is not None and index['start'] is not None:
+                if start is not None and index['end'] < start:
+                    continue
+                if end is not None and index['start'] > end:
+                    continue
+
+            for span in self._decode(path):
+                if start is not None and span.start_time + max(span.duration, 0) < start:
+                    continue
+                if end is not None and span.start_time > end:
+                    continue
+                yield span
@@ -0,0 +1,173 @@
+import sys
+import threading
+import collections
+
+from . import clock
+
+
+class Stage(object):
+    """Aggregated timings of a tracer stage. Percentiles are computed
+    on the latest `reservoir_size` calls.
+    """
+    def __init__(self, reservoir_size):
+        self.calls = 0
+        self.total_ns = 0
+        self._latest = collections.deque(maxlen=reservoir_size)
+        self._lock = threading.Lock()
+
+    def add(self, elapsed_ns):
+        with self._lock:
+            self.calls += 1
+            self.total_ns += elapsed_ns
+            self._latest.append(elapsed_ns)
+
+    def snapshot(self):
+        with self._lock:
+            latest = sorted(self._latest)
+            calls, total_ns = self.calls, self.total_ns
+
+        def percentile(p):
+            return latest[min(len(latest) - 1, int(len(latest) * p))] if latest else 0
+
+        return {
+            'calls': calls,
+            'total_ns': total_ns,
+            'p50_ns': percentile(0.50),
+            'p99_ns': percentile(0.99),
+        }
+
+
+def _timed(stage, fn):
+    timer = clock.now
+
+    def wrapper(*args, **kwargs):
+        start = timer()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stage.add(timer() - start)
+    return wrapper
+
+
+def _instrument(obj, stages):
+    """Changes the class of `obj` to a subclass where the methods and
+    properties named in `stages` are timed, so that the instance keeps
+    its type and its attributes. Returns the original class.
+    """
+    cls = type(obj)
+    namespace = {'__slots__': ()}
+    for name, stage in stages.items():
+        attr = getattr(cls, name)
+        if isinstance(attr, property):
+            namespace[name] = property(_timed(stage, attr.fget))
+        else:
+            namespace[name] = _timed(stage, attr)
+
+    obj.__class__ = type(cls.__name__, (cls,), namespace)
+    return cls
+
+
+class TracerStats(object):
+    """Measures the tracer self-overhead for each stage: `start_active_span`,
+    `finish`, the ActiveSpanSource operations, `generate_id` and
+    `record_span`. Stages are timed by wrapping the tracer components
+    only while the instrumentation is enabled, so there is no cost when
+    it's disabled. Timings of a stage include the nested ones (i.e.
+    `finish` includes `deactivate` and `record_span`).
+
+    The ActiveSpanSource, the recorder and the id generator are
+    instrumented in place, changing the class of each instance to a
+    subclass with timed methods. Components replaced while the
+    instrumentation is enabled (i.e. a new ActiveSpanSource) are not
+    instrumented.
+    """
+    def __init__(self, tracer, reservoir_size=1024):
+        self.tracer = tracer
+        self.reservoir_size = reservoir_size
+        self.stages = {}
+        self._originals = None
+        self._dumper = None
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(self.reservoir_size)
+        return stage
+
+    def snapshot(self):
+        return {name: stage.snapshot() for name, stage in self.stages.items()}
+
+    def enable(self):
+        if self._originals is not None:
+            return
+
+        tracer = self.tracer
+        span_class = tracer.span_class
+        source = tracer._active_span_source
+        recorder = tracer.recorder
+        id_generator = tracer.id_generator
+
+        # components are instrumented in place, so that they keep their
+        # type (i.e. for `isinstance()` checks) and their attributes
+        instrumented = [
+            (source, _instrument(source, {
+                'make_active': self.stage('make_active'),
+                'deactivate': self.stage('deactivate'),
+                'active_span': self.stage('active_span'),
+            })),
+            (recorder, _instrument(recorder, {'record_span': self.stage('record_span')})),
+            (id_generator, _instrument(id_generator, {'generate_id': self.stage('generate_id')})),
+        ]
+        self._originals = (instrumented, span_class)
+        tracer.span_class = type(span_class.__name__, (span_class,), {
+            '__slots__': (),
+            'finish': _timed(self.stage('finish'), span_class.finish),
+        })
+
+        # the instance attribute hides the class method
+        tracer.start_active_span = _timed(self.stage('start_active_span'), tracer.start_active_span)
+
+    def disable(self):
+        if self._originals is None:
+            return
+
+        tracer = self.tracer
+        instrumented, tracer.span_class = self._originals
+        for obj, cls in instrumented:
+            obj.__class__ = cls
+        del tracer.start_active_span
+        self._originals = None
+        self.stop_dump()
+
+    def format(self):
+        lines = ['%-18s %10s %14s %10s %10s' % ('stage', 'calls', 'total_ns', 'p50_ns', 'p99_ns')]
+        for name, stage in sorted(self.snapshot().items()):
+            lines.append('%-18s %10d %14d %10d %10d' % (
+                name, stage['calls'], stage['total_ns'], stage['p50_ns'], stage['p99_ns']))
+        return '\n'.join(lines)
+
+    def start_dump(self, interval, stream=None):
+        """Writes the stats in `stream` (default `stderr`) every
+        `interval` seconds, from a background thread.
+        """
+        if self._dumper is not None:
+            return
+
+        stream = stream or sys.stderr
+        stop = threading.Event()
+
+        def dump():
+            while not stop.wait(interval):
+                stream.write(self.format() + '\n')
+                stream.flush()
+
+        self._dumper = (threading.Thread(target=dump, name='TracerStats'), stop)
+        self._dumper[0].daemon = True
+        self._dumper[0].start()
+
+    def stop_dump(self):
+        if self._dumper is not None:
+            thread, stop = self._dumper
+            stop.set()
+            thread.join()
+            self._dumper = None
@@ -0,0 +1,25 @@
+"""Helpers for the `TornadoContextVarActiveSpanSource`, that propagates
+the ActiveSpan through the `contextvars` of the asyncio-based IOLoop.
+"""
+import contextvars
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+
+def _run_detached(callback, args, kwargs):
+    result = callback(*args, **kwargs)
+    if result is not None:
+        # native coroutines are wrapped while the empty context is the
+        # current one, so that their Task doesn't copy the caller context
+        result = gen.convert_yielded(result)
+    return result
+
+
+def spawn_callback(callback, *args, **kwargs):
+    """Replacement of `IOLoop.spawn_callback()` that executes the callback
+    in an empty context, so that it doesn't inherit the ActiveSpan of
+    the caller. Like with `TracerStackContext`, fire-and-forget callbacks
+    don't interfere with the caller execution.
+    """
+    IOLoop.current().spawn_callback(contextvars.Context().run, _run_detached, callback, args, kwargs)
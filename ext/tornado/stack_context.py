@@ -1,6 +1,15 @@
+import threading
+
 from tornado.stack_context import StackContextInconsistentError, _state
 
 
+# per-thread slot with the innermost active ``TracerStackContext``; it's
+# stored with the contexts stack it belongs to, so that it can be
+# trusted only while that stack is the current one
+_innermost = threading.local()
+_NOT_SET = (None, None)
+
+
 class TracerStackContext(object):
     """A context manager that can be used to persist local states.
     It must be used everytime a Tornado's handler or coroutine is traced.
@@ -21,8 +30,11 @@ class TracerStackContext(object):
         self.data = {}
 
     def enter(self):
-        """Required to preserve the ``StackContext`` interface"""
-        pass
+        """Required to preserve the ``StackContext`` interface. Wrapped
+        callbacks enter the contexts of their stack in order, so the last
+        call comes from the innermost one.
+        """
+        _innermost.value = (_state.contexts[0], self)
 
     def exit(self, type, value, traceback):
         """Required to preserve the ``StackContext`` interface"""
@@ -32,11 +44,15 @@ class TracerStackContext(object):
         self.old_contexts = _state.contexts
         self.new_contexts = (self.old_contexts[0] + (self,), self)
         _state.contexts = self.new_contexts
+
+        self.old_innermost = getattr(_innermost, 'value', _NOT_SET)
+        _innermost.value = (self.new_contexts[0], self)
         return self
 
     def __exit__(self, type, value, traceback):
         final_contexts = _state.contexts
         _state.contexts = self.old_contexts
+        _innermost.value = self.old_innermost
 
         if final_contexts is not self.new_contexts:
             raise StackContextInconsistentError(
@@ -45,9 +61,12 @@ class TracerStackContext(object):
 
         # break the reference to allow faster GC on CPython
         self.new_contexts = None
+        self.old_innermost = None
 
     def deactivate(self):
         self.active = False
+        if getattr(_innermost, 'value', _NOT_SET)[1] is self:
+            _innermost.value = _NOT_SET
 
     @classmethod
     def current_data(cls):
@@ -55,6 +74,19 @@ class TracerStackContext(object):
         used inside a Tornado coroutine to retrieve and use the current
         tracing context.
         """
-        for ctx in reversed(_state.contexts[0]):
+        contexts = _state.contexts[0]
+        stack, ctx = getattr(_innermost, 'value', _NOT_SET)
+        if stack is contexts:
+            if ctx is None:
+                return None
+            if ctx.active:
+                return ctx.data
+
+        # the stack has been changed without entering a TracerStackContext
+        # (i.e. a ``NullContext``): find the innermost one and store it
+        for ctx in reversed(contexts):
             if isinstance(ctx, cls) and ctx.active:
+                _innermost.value = (contexts, ctx)
                 return ctx.data
+
+        _innermost.value = (contexts, None)
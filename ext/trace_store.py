@@ -0,0 +1,180 @@
+import bisect
+import threading
+import collections
+
+
+class TraceNode(object):
+    """Node of a reconstructed trace tree"""
+    __slots__ = ('span', 'children')
+
+    def __init__(self, span):
+        self.span = span
+        self.children = []
+
+    def walk(self):
+        """Yields the spans of the subtree, depth first"""
+        yield self.span
+        for child in self.children:
+            yield from child.walk()
+
+
+def build_trees(spans):
+    """Returns the root nodes of the trees of `spans`, linked through
+    their `parent_id`. Spans whose parent is not available (i.e. it's
+    evicted or not finished yet) are roots. Children are sorted by
+    start time.
+    """
+    nodes = {span._context.span_id: TraceNode(span) for span in spans}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node.span.parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent.children.append(node)
+
+    for node in nodes.values():
+        node.children.sort(key=lambda child: child.span.start_time)
+    roots.sort(key=lambda root: root.span.start_time)
+    return roots
+
+
+class TraceStore(object):
+    """Recorder that keeps the latest `max_spans` finished spans in a
+    ring, with secondary indexes by trace id, operation name, duration
+    and tag. Indexes are updated when a span is recorded and when it's
+    evicted, so queries never scan the whole ring.
+
+    Recorded spans are stored as they are, so they're never released to
+    a `SpanPool`. Only tags with hashable values are indexed.
+    """
+    keeps_spans = True
+
+    def __init__(self, max_spans=10000):
+        self.max_spans = max_spans
+        self._ring = [None] * max_spans
+        # sequence number of the next recorded span; it identifies a span
+        # in the indexes while it's in the ring
+        self._next = 0
+
+        self._by_trace = {}
+        self._by_operation = {}
+        self._by_tag = {}
+        # sorted (duration, seq) pairs, globally and per operation
+        self._durations = []
+        self._operation_durations = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._next, self.max_spans)
+
+    def record_span(self, span):
+        with self._lock:
+            seq = self._next
+            self._next += 1
+            slot = seq % self.max_spans
+            if self._ring[slot] is not None:
+                self._evict(seq - self.max_spans, *self._ring[slot])
+
+            trace_id = span._context.trace_id
+            self._by_trace.setdefault(trace_id, collections.deque()).append(seq)
+            self._by_operation.setdefault(span.operation_name, collections.deque()).append(seq)
+
+            tags = []
+            for tag in span.tags.items():
+                try:
+                    self._by_tag.setdefault(tag, collections.deque()).append(seq)
+                except TypeError:
+                    # not hashable
+                    continue
+                tags.append(tag)
+
+            entry = (span.duration, seq)
+            bisect.insort(self._durations, entry)
+            bisect.insort(self._operation_durations.setdefault(span.operation_name, []), entry)
+
+            # the indexed values are stored with the span, because it may
+            # be changed after it has been recorded
+            self._ring[slot] = (span, trace_id, span.operation_name, span.duration, tags)
+
+    def _evict(self, seq, span, trace_id, operation_name, duration, tags):
+        # the evicted span is the oldest one, so it's the first of each
+        # index it belongs to
+        _popleft(self._by_trace, trace_id, seq)
+        _popleft(self._by_operation, operation_name, seq)
+        for tag in tags:
+            _popleft(self._by_tag, tag, seq)
+
+        entry = (duration, seq)
+        _remove_sorted(self._durations, entry)
+        durations = self._operation_durations[operation_name]
+        _remove_sorted(durations, entry)
+        if not durations:
+            del self._operation_durations[operation_name]
+
+    def _spans(self, seqs):
+        return [self._ring[seq % self.max_spans][0] for seq in seqs]
+
+    def get_trace(self, trace_id):
+        """Returns the root nodes of the trace, or an empty list"""
+        with self._lock:
+            spans = self._spans(self._by_trace.get(trace_id, ()))
+        return build_trees(spans)
+
+    def get_traces(self, spans):
+        """Returns the trees of the traces that include `spans`, as a
+        `trace_id -> roots` dict.
+        """
+        trace_ids = {span._context.trace_id for span in spans}
+        return {trace_id: self.get_trace(trace_id) for trace_id in trace_ids}
+
+    def find_by_operation(self, operation_name):
+        """Returns the spans of an operation, oldest first"""
+        with self._lock:
+            return self._spans(self._by_operation.get(operation_name, ()))
+
+    def find_by_tag(self, key, value):
+        """Returns the spans with the given tag, oldest first"""
+        with self._lock:
+            return self._spans(self._by_tag.get((key, value), ()))
+
+    def find_by_duration(self, min_duration=None, max_duration=None, operation_name=None):
+        """Returns the spans with a duration in the given range (both ends
+        included), optionally of a single operation, shortest first.
+        """
+        with self._lock:
+            if operation_name is None:
+                durations = self._durations
+            else:
+                durations = self._operation_durations.get(operation_name, [])
+
+            start = 0 if min_duration is None else bisect.bisect_left(durations, (min_duration, -1))
+            end = len(durations)
+            if max_duration is not None:
+                end = bisect.bisect_left(durations, (max_duration, self._next))
+            return self._spans(seq for _, seq in durations[start:end])
+
+    def slowest(self, n, operation_name=None):
+        """Returns the `n` slowest spans, optionally of a single operation,
+        slowest first.
+        """
+        with self._lock:
+            if operation_name is None:
+                durations = self._durations
+            else:
+                durations = self._operation_durations.get(operation_name, [])
+            return self._spans(seq for _, seq in reversed(durations[-n:] if n else []))
+
+
+def _popleft(index, key, seq):
+    seqs = index.get(key)
+    if seqs and seqs[0] == seq:
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+
+def _remove_sorted(entries, entry):
+    position = bisect.bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
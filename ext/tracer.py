@@ -1,12 +1,122 @@
+import opentracing
+
 from proposal import Tracer as ProposalMixin
 
+from basictracer.context import SpanContext
 from basictracer.tracer import BasicTracer
 
+from .ids import RandomIdGenerator
+from .sampler import ConstSampler
+from .span import Span, NonRecordingSpan
+from .stats import TracerStats
+
 
 class DebugTracer(ProposalMixin, BasicTracer):
     """DebugTracer is a real implementation of an OpenTracing
     Tracer that uses the reference implementation extended with
     the Tracer proposal. It is used to run real examples with
     the extended API.
+
+    The `sampler` decides if a trace is recorded when its root `Span`
+    is created; not sampled traces use a `NonRecordingSpan`. Recorded
+    spans are instances of `span_class` (i.e. `Span` or `CompactSpan`)
+    and their ids are created by the `id_generator`. If a `span_pool`
+    is given, recorded spans and their contexts are recycled, unless the
+    recorder keeps them (see `SpanPool`).
+
+    The tracer self-overhead can be measured with `enable_stats()`.
     """
-    pass
+    def __init__(self, recorder=None, sampler=None, span_class=Span, id_generator=None,
+                 span_pool=None):
+        sampler = ConstSampler(True) if sampler is None else sampler
+        super(DebugTracer, self).__init__(recorder=recorder, sampler=sampler)
+        self.span_class = span_class
+        self.id_generator = RandomIdGenerator() if id_generator is None else id_generator
+        self.span_pool = span_pool
+        self._stats = TracerStats(self)
+
+    def enable_stats(self, dump_interval=None, stream=None):
+        """Instruments the tracer hot paths. If `dump_interval` is set, the
+        stats are written in `stream` (default `stderr`) periodically.
+        """
+        self._stats.enable()
+        if dump_interval is not None:
+            self._stats.start_dump(dump_interval, stream)
+
+    def disable_stats(self):
+        """Removes the instrumentation; collected stats are preserved"""
+        self._stats.disable()
+
+    def stats(self):
+        """Returns calls, total and percentiles nanoseconds of each stage"""
+        return self._stats.snapshot()
+
+    def start_active_span(self, operation_name, tags=None, start_time=None):
+        # same as the proposal Tracer, without going through the
+        # `active_span_source` property and `start_manual_span()`
+        source = self._active_span_source
+        span = self.start_span(operation_name, source.active_span, None, tags, start_time)
+        source.make_active(span)
+        return span
+
+    def start_span(self, operation_name=None, child_of=None,
+                   references=None, tags=None, start_time=None):
+        if type(child_of) is NonRecordingSpan and not child_of._context.sampled:
+            # the whole trace shares the root SpanContext, without
+            # generating ids
+            return NonRecordingSpan(self, child_of._context)
+
+        # See if we have a parent_ctx in `references`
+        parent_ctx = None
+        if child_of is not None:
+            parent_ctx = (
+                child_of if isinstance(child_of, opentracing.SpanContext)
+                else child_of.context)
+        elif references is not None and len(references) > 0:
+            parent_ctx = references[0].referenced_context
+
+        # a context without a trace (i.e. the NoopActiveSpanSource one)
+        # doesn't have a parent
+        if getattr(parent_ctx, 'trace_id', None) is None:
+            parent_ctx = None
+
+        if parent_ctx is None:
+            # the sampling decision is taken for the root Span only
+            trace_id = self.id_generator.generate_id()
+            if not self.sampler.sampled(trace_id, operation_name):
+                # the root span id is the trace id, so that the context
+                # can be injected without generating another id
+                ctx = SpanContext(trace_id=trace_id, span_id=trace_id, sampled=False)
+                return NonRecordingSpan(self, ctx)
+
+            baggage = None
+            parent_id = None
+        elif not parent_ctx.sampled:
+            # the whole trace shares the root SpanContext
+            return NonRecordingSpan(self, parent_ctx)
+        else:
+            # baggage is copied on write by `with_baggage_item()`
+            trace_id = parent_ctx.trace_id
+            baggage = parent_ctx._baggage
+            parent_id = parent_ctx.span_id
+
+        span_id = self.id_generator.generate_id()
+        if self.span_pool is not None:
+            return self.span_pool.acquire(
+                self, trace_id, span_id, baggage, operation_name,
+                parent_id, tags, start_time)
+
+        return self.span_class(
+            self,
+            operation_name=operation_name,
+            context=SpanContext(trace_id=trace_id, span_id=span_id, baggage=baggage),
+            parent_id=parent_id,
+            tags=tags,
+            start_time=start_time,
+        )
+
+    def record(self, span):
+        recorder = self.recorder
+        recorder.record_span(span)
+        if self.span_pool is not None and not getattr(recorder, 'keeps_spans', False):
+            self.span_pool.release(span)
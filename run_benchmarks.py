@@ -0,0 +1,44 @@
+import sys
+import json
+import argparse
+import platform
+
+from benchmarks import active_span_source
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='ActiveSpanSource micro-benchmarks')
+    parser.add_argument('-o', '--output', help='write JSON results in this file')
+    parser.add_argument('-s', '--source', action='append', help='benchmark only this source')
+    parser.add_argument('-n', '--iterations', type=int, default=1000)
+    parser.add_argument('-d', '--depth', type=int, action='append')
+    parser.add_argument('-c', '--concurrency', type=int, action='append')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = active_span_source.run(
+        sources=args.source,
+        iterations=args.iterations,
+        depths=args.depth or (0, 1, 10, 50),
+        concurrency=args.concurrency or (1, 10, 100),
+    )
+
+    # human readable summary
+    columns = ('source', 'depth', 'concurrency') + active_span_source.OPERATIONS
+    print(' '.join('%12s' % c for c in columns))
+    for result in results:
+        print(' '.join('%12s' % result[c] for c in columns))
+
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'iterations': args.iterations,
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('results written in %s' % args.output, file=sys.stderr)
@@ -4,10 +4,12 @@ from ext.active_span_source import (
     ThreadActiveSpanSource,
     GeventActiveSpanSource,
     TornadoActiveSpanSource,
+    TornadoContextVarActiveSpanSource,
 )
 
+from tornado import version_info as tornado_version
 from tornado.ioloop import IOLoop
-from examples import asyncio, threads, gevent, tornado
+from examples import asyncio, threads, gevent
 
 
 if __name__ == '__main__':
@@ -31,9 +33,22 @@ if __name__ == '__main__':
     gevent.main_greenlet_not_instrumented_children()
 
     # tornado (starts / stops the loop for each call)
-    tracer._active_span_source = TornadoActiveSpanSource()
-    IOLoop.current().run_sync(tornado.coroutines_propagation)
-    IOLoop.current().run_sync(tornado.coroutines_without_propagation)
-    IOLoop.current().run_sync(tornado.coroutine_with_a_callback)
-    IOLoop.current().run_sync(tornado.tornado_plain_callback)
-    IOLoop.current().run_sync(tornado.tornado_spawn_callback)
+    if tornado_version < (6,):
+        from examples import tornado
+
+        tracer._active_span_source = TornadoActiveSpanSource()
+        IOLoop.current().run_sync(tornado.coroutines_propagation)
+        IOLoop.current().run_sync(tornado.coroutines_without_propagation)
+        IOLoop.current().run_sync(tornado.coroutine_with_a_callback)
+        IOLoop.current().run_sync(tornado.tornado_plain_callback)
+        IOLoop.current().run_sync(tornado.tornado_spawn_callback)
+
+    # tornado on the asyncio loop, without StackContext
+    if tornado_version >= (5,):
+        from examples import tornado_context
+
+        tracer._active_span_source = TornadoContextVarActiveSpanSource()
+        IOLoop.current().run_sync(tornado_context.coroutines_propagation)
+        IOLoop.current().run_sync(tornado_context.native_coroutines_propagation)
+        IOLoop.current().run_sync(tornado_context.tornado_plain_callback)
+        IOLoop.current().run_sync(tornado_context.tornado_spawn_callback)
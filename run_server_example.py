@@ -1,18 +1,24 @@
+import sys
 import asyncio
 
 from ext import tracer
 from ext.active_span_source import AsyncioActiveSpanSource
+from ext.asyncio_recorder import AsyncioRecorder
 
 from examples import server
 
 
 if __name__ == '__main__':
-    # start a fake web server with a complex interaction
+    # start a fake web server with a complex interaction; spans are
+    # written by a background Task so that the loop is never blocked
     tracer._active_span_source = AsyncioActiveSpanSource()
+    tracer.recorder = AsyncioRecorder(stream=sys.stdout, flush_interval=0.5)
     try:
         loop = asyncio.get_event_loop()
+        loop.call_soon(tracer.recorder.start)
         loop.run_until_complete(server.run())
     except KeyboardInterrupt:
         pass
     finally:
+        loop.run_until_complete(tracer.recorder.close())
         loop.close()
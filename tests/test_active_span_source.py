@@ -0,0 +1,256 @@
+import gc
+import asyncio
+import weakref
+import threading
+
+import pytest
+
+from ext import helpers
+from ext.tracer import DebugTracer
+from ext.span import NonRecordingSpan
+from ext.reaper import SpanReaper
+from ext.active_span_source import (
+    AsyncioActiveSpanSource,
+    ContextVarActiveSpanSource,
+    ThreadActiveSpanSource,
+)
+
+from tests.utils import ListRecorder
+
+
+def make_tracer(source):
+    tracer = DebugTracer(recorder=ListRecorder())
+    tracer._active_span_source = source
+    return tracer
+
+
+@pytest.mark.parametrize('reaper', [False, True])
+def test_abandoned_spans_in_threads_are_collected(reaper):
+    tracer = make_tracer(ThreadActiveSpanSource())
+    if reaper:
+        SpanReaper([tracer.active_span_source])
+    refs = []
+
+    def worker():
+        # activated but never finished nor deactivated
+        refs.append(weakref.ref(tracer.start_active_span('abandoned')))
+
+    for _ in range(100):
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+
+    gc.collect()
+    assert len(refs) == 100
+    assert all(ref() is None for ref in refs)
+    if reaper:
+        assert len(tracer.active_span_source.live_spans) == 0
+
+
+@pytest.mark.parametrize('source', [AsyncioActiveSpanSource, ContextVarActiveSpanSource])
+def test_abandoned_spans_in_tasks_are_collected(source):
+    tracer = make_tracer(source())
+    refs = []
+
+    async def worker():
+        refs.append(weakref.ref(tracer.start_active_span('abandoned')))
+
+    async def run():
+        await asyncio.gather(*[worker() for _ in range(100)])
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(run())
+    loop.close()
+
+    gc.collect()
+    assert len(refs) == 100
+    assert all(ref() is None for ref in refs)
+
+
+def test_unreferenced_active_span_stays_active():
+    tracer = make_tracer(ThreadActiveSpanSource())
+
+    tracer.start_active_span('parent')
+    gc.collect()
+    parent = tracer.active_span
+    assert parent.operation_name == 'parent'
+
+    with tracer.start_active_span('child') as child:
+        assert child.parent_id == parent.context.span_id
+    assert tracer.active_span is parent
+    parent.finish()
+    assert tracer.active_span is None
+
+
+def test_finished_parent_is_not_kept_alive_by_children():
+    tracer = make_tracer(ThreadActiveSpanSource())
+    # finished spans are not kept by the recorder
+    tracer.record = lambda span: None
+
+    parent = tracer.start_active_span('parent')
+    parent_id = parent.context.span_id
+    child = tracer.start_active_span('child')
+
+    # finished out of order: the child is still the ActiveSpan
+    parent.finish()
+    ref = weakref.ref(parent)
+    del parent
+    gc.collect()
+
+    assert ref() is None
+    assert tracer.active_span is child
+    child.finish()
+
+    # the finished parent is restored through its context
+    restored = tracer.active_span
+    assert isinstance(restored, NonRecordingSpan)
+    assert restored.context.span_id == parent_id
+    with tracer.start_active_span('sibling') as sibling:
+        assert sibling.parent_id == parent_id
+
+
+@pytest.mark.parametrize('source', [AsyncioActiveSpanSource, ContextVarActiveSpanSource])
+def test_parent_finished_before_child_started(source):
+    source = source()
+    tracer = make_tracer(source)
+    # finished spans are not kept by the recorder
+    tracer.record = lambda span: None
+    refs = []
+    parents = []
+
+    async def background():
+        # the parent is finished and collected before the child starts
+        await asyncio.sleep(0)
+        gc.collect()
+        assert refs[0]() is None
+        with tracer.start_active_span('bg') as span:
+            parents.append(span.parent_id)
+
+    async def request():
+        with tracer.start_active_span('req') as req:
+            task = asyncio.ensure_future(background())
+            if isinstance(source, AsyncioActiveSpanSource):
+                source.inherit(task)
+            refs.append(weakref.ref(req))
+            return task, req.context.span_id
+
+    async def run():
+        task, parent_id = await request()
+        await task
+        return parent_id
+
+    loop = asyncio.new_event_loop()
+    parent_id = loop.run_until_complete(run())
+    loop.close()
+
+    assert parents == [parent_id]
+
+
+def test_reaper_reports_live_spans():
+    source = ThreadActiveSpanSource()
+    tracer = make_tracer(source)
+    reported = []
+    reaper = SpanReaper([source], max_age=0, report=lambda span, age: reported.append(span))
+
+    span = tracer.start_active_span('stuck')
+    with tracer.start_active_span('done'):
+        pass
+    reaper.reap()
+    assert reported == [span]
+    assert reaper.live_spans() == {'ThreadActiveSpanSource': 1}
+
+
+@pytest.fixture
+def asyncio_tracer(monkeypatch):
+    # `helpers.ensure_future()` uses the global tracer
+    monkeypatch.setattr(helpers.tracer, 'recorder', ListRecorder())
+    monkeypatch.setattr(helpers.tracer, '_active_span_source', AsyncioActiveSpanSource())
+    return helpers.tracer
+
+
+async def child_span(tracer):
+    return tracer.start_active_span('child')
+
+
+def test_ensure_future_inherits_span_activated_outside_task(asyncio_tracer):
+    tracer = asyncio_tracer
+    loop = asyncio.new_event_loop()
+    tasks = []
+
+    def callback():
+        # executed by the running loop, but not in a Task
+        with tracer.start_active_span('callback') as span:
+            tasks.append((span, helpers.ensure_future(child_span(tracer))))
+
+    async def run():
+        # the callback is executed before this Task is resumed
+        await asyncio.sleep(0)
+        for _, task in tasks:
+            await task
+
+    with tracer.start_active_span('parent') as parent:
+        tasks.append((parent, helpers.ensure_future(child_span(tracer), loop=loop)))
+    loop.call_soon(callback)
+    loop.run_until_complete(run())
+    loop.close()
+
+    assert len(tasks) == 2
+    for span, task in tasks:
+        assert task.result().parent_id == span.context.span_id
+    assert tracer.active_span is None
+
+
+def test_plain_tasks_dont_inherit_span_activated_outside_task(asyncio_tracer):
+    tracer = asyncio_tracer
+    loop = asyncio.new_event_loop()
+
+    with tracer.start_active_span('parent'):
+        task = loop.create_task(child_span(tracer))
+    loop.run_until_complete(task)
+    loop.close()
+
+    assert task.result().parent_id is None
+
+
+def test_contextvar_tasks_inherit_without_sharing():
+    tracer = make_tracer(ContextVarActiveSpanSource())
+    seen = {}
+
+    async def worker(name):
+        parent = tracer.active_span
+        with tracer.start_active_span(name) as span:
+            # the other workers run while this span is active
+            await asyncio.sleep(0)
+            assert tracer.active_span is span
+            seen[name] = (parent, span.parent_id)
+        assert tracer.active_span is parent
+
+    async def run():
+        with tracer.start_active_span('request') as request:
+            await asyncio.gather(*[worker('worker-%d' % i) for i in range(3)])
+            assert tracer.active_span is request
+            return request
+
+    loop = asyncio.new_event_loop()
+    request = loop.run_until_complete(run())
+    loop.close()
+
+    assert len(seen) == 3
+    for parent, parent_id in seen.values():
+        assert parent is request
+        assert parent_id == request.context.span_id
+    assert tracer.active_span is None
+
+
+def test_contextvar_deactivate_not_active_span():
+    source = ContextVarActiveSpanSource()
+    tracer = make_tracer(source)
+
+    parent = tracer.start_active_span('parent')
+    child = tracer.start_active_span('child')
+    # finishing the parent first doesn't change the ActiveSpan, and the
+    # child still restores it
+    parent.finish()
+    assert tracer.active_span is child
+    child.finish()
+    assert tracer.active_span is parent
@@ -0,0 +1,96 @@
+import time
+import asyncio
+
+import pytest
+
+from ext.tracer import DebugTracer
+from ext.collector import Collector
+from ext.encoding import SpanEncoder, SpanDecoder
+from ext.asyncio_recorder import AsyncioRecorder
+
+from tests.utils import ListRecorder, BrokenStream, BrokenBytesStream
+
+
+def record_spans(address, spans):
+    async def run():
+        recorder = AsyncioRecorder(address=address, flush_interval=0.05)
+        recorder.start()
+        tracer = DebugTracer(recorder=recorder)
+        for i in range(spans):
+            tracer.start_span('request', tags={'url': '/items/%d' % i, 'index': i}).finish()
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+        await recorder.close()
+        return recorder
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('address', ['udp', 'unix'])
+def test_spans_reach_the_collector(tmp_path, address):
+    received = ListRecorder()
+    if address == 'udp':
+        collector = Collector(('127.0.0.1', 0), recorder=received).start()
+        address = collector.server.server_address
+    else:
+        address = str(tmp_path / 'spans.sock')
+        collector = Collector(address, recorder=received).start()
+
+    try:
+        recorder = record_spans(address, 1000)
+        wait_for(lambda: collector.received_spans >= 1000)
+    finally:
+        collector.stop()
+
+    assert recorder.dropped_spans == 0
+    assert recorder.flushed_spans == 1000
+    assert collector.received_spans == 1000
+    assert sorted(span.tags['index'] for span in received.spans) == list(range(1000))
+    assert all(span.tags['url'] == '/items/%d' % span.tags['index'] for span in received.spans)
+
+
+@pytest.mark.parametrize('encoder', [None, SpanEncoder])
+def test_write_errors_keep_the_task_alive(capsys, encoder):
+    stream = BrokenStream(failures=1) if encoder is None else BrokenBytesStream(failures=1)
+
+    async def run():
+        recorder = AsyncioRecorder(stream=stream, flush_interval=0.01,
+                                   encoder=encoder and encoder())
+        recorder.start()
+        tracer = DebugTracer(recorder=recorder)
+
+        tracer.start_span('lost').finish()
+        for _ in range(500):
+            if recorder.failed_spans:
+                break
+            await asyncio.sleep(0.01)
+        tracer.start_span('written').finish()
+        await recorder.close()
+        return recorder
+
+    loop = asyncio.new_event_loop()
+    try:
+        recorder = loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+    assert recorder.failed_spans == 1
+    assert recorder.flushed_spans == 1
+    assert 'failed to write 1 spans' in capsys.readouterr().err
+    if encoder is None:
+        assert 'written' in stream.getvalue()
+        assert 'lost' not in stream.getvalue()
+    else:
+        # the interned operation name of the failed batch is written again
+        spans = list(SpanDecoder().feed(stream.getvalue()))
+        assert [span.operation_name for span in spans] == ['written']
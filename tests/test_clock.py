@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from ext import clock
+from ext.tracer import DebugTracer
+from ext.span import Span, CompactSpan
+
+from tests.utils import ListRecorder
+
+
+def test_wall_time_conversions():
+    before = time.time()
+    wall = clock.to_wall(clock.now())
+    assert before - 0.01 <= wall <= time.time() + 0.01
+
+    timestamp = clock.from_wall(1500000000.123456789)
+    assert clock.to_wall_ns(timestamp) == 1500000000123456768
+    assert clock.to_wall(timestamp) == 1500000000.123456789
+
+
+@pytest.mark.parametrize('nanoseconds, formatted', [
+    (0, '0.000000000'),
+    (1, '0.000000001'),
+    (1500000000123456789, '1500000000.123456789'),
+    (-1500000000, '-1.500000000'),
+])
+def test_format_ns(nanoseconds, formatted):
+    assert clock.format_ns(nanoseconds) == formatted
+
+
+@pytest.mark.parametrize('span_class', [Span, CompactSpan])
+def test_span_timings(span_class):
+    tracer = DebugTracer(recorder=ListRecorder(), span_class=span_class)
+
+    span = tracer.start_span('request', start_time=1500000000.5)
+    assert span.duration == -1 and span.duration_ns == -1
+    span.finish(finish_time=1500000002.0)
+    assert span.start_time == 1500000000.5
+    assert span.start_time_ns == 1500000000500000000
+    assert span.duration_ns == 1500000000
+    assert span.duration == 1.5
+
+    span = tracer.start_span('request')
+    span.finish()
+    assert 0 <= span.duration_ns < 1000000000
+    assert span.duration == span.duration_ns / 1e9
+
+
+def test_anchor_keeps_durations(monkeypatch):
+    tracer = DebugTracer(recorder=ListRecorder())
+    span = tracer.start_span('request')
+    span.finish()
+    duration_ns, start_time_ns = span.duration_ns, span.start_time_ns
+
+    # the wall clock has been moved one hour back
+    wall_ns = clock._wall_ns
+    monkeypatch.setattr(clock, '_wall_ns', lambda: wall_ns() - 3600 * 1000000000)
+    monkeypatch.setattr(clock, '_offset', clock._offset)
+    clock.anchor()
+    assert span.duration_ns == duration_ns
+    assert abs(start_time_ns - span.start_time_ns - 3600 * 1000000000) < 10000000
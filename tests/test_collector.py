@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from ext.tracer import DebugTracer
+from ext.encoding import SpanDecoder, encode_datagrams
+from ext.collector import Collector, CollectorReporter
+
+from tests.utils import ListRecorder
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_datagrams_are_decoded_alone():
+    recorder = ListRecorder()
+    tracer = DebugTracer(recorder=recorder)
+    for i in range(200):
+        tracer.start_span('request', tags={'index': i}).finish()
+    tracer.start_span('large', tags={'payload': 'x' * 2048}).finish()
+
+    decoded = []
+    for data, count in encode_datagrams(recorder.spans, 1024):
+        assert len(data) <= 1024
+        spans = list(SpanDecoder().feed(data))
+        assert len(spans) == count
+        decoded.extend(spans)
+    assert [span.tags['index'] for span in decoded] == list(range(200))
+
+
+@pytest.fixture(params=['udp', 'unix'])
+def collector(request, tmp_path):
+    if request.param == 'udp':
+        collector = Collector(('127.0.0.1', 0), recorder=ListRecorder()).start()
+        collector.address = collector.server.server_address
+    else:
+        collector = Collector(str(tmp_path / 'spans.sock'), recorder=ListRecorder()).start()
+    yield collector
+    collector.stop()
+
+
+def test_large_batch_reaches_the_collector(collector):
+    reporter = CollectorReporter(collector.address, max_batch_size=1000, flush_interval=60)
+    tracer = DebugTracer(recorder=reporter)
+    for i in range(1000):
+        tracer.start_span('request', tags={'url': '/items/%d' % i, 'index': i}).finish()
+    reporter.close()
+    wait_for(lambda: collector.received_spans >= 1000)
+
+    assert reporter.flushed_spans == 1000
+    assert reporter.dropped_spans == 0
+    assert collector.received_spans == 1000
+    indexes = sorted(span.tags['index'] for span in collector.recorder.spans)
+    assert indexes == list(range(1000))
+
+
+def test_spans_larger_than_a_datagram_are_dropped(collector):
+    reporter = CollectorReporter(collector.address, flush_interval=60, max_datagram_size=1024)
+    tracer = DebugTracer(recorder=reporter)
+    tracer.start_span('small').finish()
+    tracer.start_span('large', tags={'payload': 'x' * 2048}).finish()
+    tracer.start_span('small').finish()
+    reporter.close()
+    expected = 2 if isinstance(collector.address, tuple) else 3
+    wait_for(lambda: collector.received_spans >= expected)
+
+    assert reporter.flushed_spans == expected
+    assert reporter.dropped_spans == 3 - expected
+    assert collector.received_spans == expected
+
+
+def test_reporter_reconnects_with_backoff(tmp_path):
+    address = str(tmp_path / 'spans.sock')
+    reporter = CollectorReporter(address, connections=1, min_backoff=0.05, flush_interval=60)
+    tracer = DebugTracer(recorder=reporter)
+    connection = reporter._connections.queue[0]
+
+    # the collector is not running: batches are dropped
+    tracer.start_span('lost').finish()
+    reporter.flush()
+    tracer.start_span('lost').finish()
+    reporter.flush()
+    assert reporter.dropped_spans == 2
+    assert connection.backoff == 0.1
+
+    collector = Collector(address, recorder=ListRecorder()).start()
+    try:
+        # wait for the end of the backoff
+        time.sleep(0.1)
+        tracer.start_span('request').finish()
+        reporter.flush()
+        tracer.start_span('request').finish()
+        reporter.close()
+        wait_for(lambda: collector.received_spans >= 2)
+    finally:
+        collector.stop()
+
+    assert reporter.flushed_spans == 2
+    assert connection.backoff == 0.05
+    assert [span.operation_name for span in collector.recorder.spans] == ['request', 'request']
@@ -0,0 +1,133 @@
+import pickle
+
+import pytest
+
+from ext import clock
+from ext.ids import IdGenerator
+from ext.tracer import DebugTracer
+from ext.span import Span, CompactSpan, FinishedSpan
+from ext.encoding import SpanEncoder, SpanDecoder
+
+from tests.utils import ListRecorder
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Records a parent and a child span, timed with a fake clock"""
+    ticks = iter(range(1000000001, 2000000000, 1000003))
+    monkeypatch.setattr(clock, 'now', lambda: next(ticks))
+
+    def record(span_class):
+        recorder = ListRecorder()
+        tracer = DebugTracer(recorder=recorder, span_class=span_class)
+        with tracer.start_span('request', tags={'url': '/home'}) as parent:
+            with tracer.start_span('db.query', child_of=parent) as child:
+                child.log_kv({'event': 'cache.miss', 'rows': 3, 'ratio': 0.5})
+                child.log_kv({'event': 'done', 'error': None, 'raw': b'\x00'})
+                child.set_tag('error', False)
+        return recorder.spans
+    return record
+
+
+@pytest.mark.parametrize('span_class', [Span, CompactSpan])
+def test_round_trip(spans, span_class):
+    recorded = spans(span_class)
+    encoder = SpanEncoder()
+    for span in recorded:
+        encoder.encode(span)
+    decoded = list(SpanDecoder().feed(encoder.take()))
+
+    assert len(decoded) == len(recorded)
+    for span, copy in zip(recorded, decoded):
+        assert isinstance(copy, FinishedSpan)
+        assert copy.operation_name == span.operation_name
+        assert copy.context.trace_id == span.context.trace_id
+        assert copy.context.span_id == span.context.span_id
+        assert copy.parent_id == span.parent_id
+        assert copy.start_time_ns == span.start_time_ns
+        assert copy.duration_ns == span.duration_ns
+        assert copy.tags == span.tags
+        # log timestamps are exact, without a round-trip through seconds
+        assert copy.logs_ns == span.logs_ns
+        assert [log.key_values for log in copy.logs] == [log.key_values for log in span.logs]
+
+
+def test_log_timestamps_are_unix_nanoseconds(spans):
+    child = spans(Span)[0]
+    assert [timestamp for _, timestamp in child.logs_ns] == [
+        clock.to_wall_ns(1000000001 + 1000003 * 2),
+        clock.to_wall_ns(1000000001 + 1000003 * 3),
+    ]
+    assert [log.timestamp for log in child.logs] == [
+        clock.to_wall(1000000001 + 1000003 * 2),
+        clock.to_wall(1000000001 + 1000003 * 3),
+    ]
+
+
+def test_chunked_feed(spans):
+    encoder = SpanEncoder()
+    for span in spans(CompactSpan):
+        encoder.encode(span)
+    data = encoder.take()
+
+    decoder = SpanDecoder()
+    decoded = []
+    for i in range(len(data)):
+        decoded.extend(decoder.feed(data[i:i + 1]))
+    assert [span.operation_name for span in decoded] == ['db.query', 'request']
+
+
+def test_finished_span_can_be_pickled(spans):
+    child = spans(Span)[0]
+    copy = pickle.loads(pickle.dumps(FinishedSpan.from_span(child)))
+    assert copy.logs_ns == child.logs_ns
+    assert copy.start_time_ns == child.start_time_ns
+    assert copy.tags == {'error': False}
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False, 0, 1, -1, 2 ** 63, -2 ** 63, 0.25, float('inf'),
+    '', 'café', b'\x00\xff',
+])
+def test_tag_values(value):
+    tracer = DebugTracer(recorder=ListRecorder())
+    span = tracer.start_span('request', tags={'value': value})
+    encoder = SpanEncoder()
+    encoder.encode(span)
+
+    copy, = SpanDecoder().feed(encoder.take())
+    assert type(copy.tags['value']) is type(value)
+    assert copy.tags['value'] == value
+    # not finished yet
+    assert copy.duration_ns == -1
+
+
+class SequentialIds(IdGenerator):
+    def __init__(self):
+        self.last = 0
+
+    def generate_id(self):
+        self.last += 1
+        return self.last
+
+
+def test_strings_are_interned_until_the_table_is_full():
+    # small ids, so that all the spans have the same size
+    tracer = DebugTracer(recorder=ListRecorder(), id_generator=SequentialIds())
+    encoder = SpanEncoder(max_strings=4)
+    decoder = SpanDecoder()
+    sizes = []
+    decoded = []
+    for name in 'aabbcc':
+        span = tracer.start_span('operation-' + name, tags={'key-' + name: 1})
+        encoder.encode(span)
+        data = encoder.take()
+        sizes.append(len(data))
+        decoded.extend(decoder.feed(data))
+
+    # repeated strings are referenced, until a reset clears the table
+    inline, referenced = sizes[:2]
+    assert referenced < inline
+    assert sizes == [inline, referenced, inline, inline + 1, inline, inline + 1]
+    assert [(span.operation_name, list(span.tags)) for span in decoded] == [
+        ('operation-' + name, ['key-' + name]) for name in 'aabbcc']
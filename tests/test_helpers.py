@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from ext import tracer
+from ext.helpers import TracedProcessPoolExecutor
+from ext.active_span_source import ThreadActiveSpanSource
+
+from tests.utils import ListRecorder
+
+
+def slow_task(value):
+    time.sleep(0.2)
+    return value
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = ListRecorder()
+    monkeypatch.setattr(tracer, 'recorder', recorder)
+    monkeypatch.setattr(tracer, '_active_span_source', ThreadActiveSpanSource())
+    return recorder
+
+
+@pytest.mark.parametrize('wait', [True, False])
+def test_process_pool_shutdown_records_all_spans(recorder, wait):
+    executor = TracedProcessPoolExecutor(max_workers=2)
+    with tracer.start_active_span('parent') as parent:
+        futures = [executor.submit(slow_task, i) for i in range(4)]
+    executor.shutdown(wait=wait)
+
+    assert sorted(f.result() for f in futures) == [0, 1, 2, 3]
+    executor._receiver.join(10)
+    assert not executor._receiver.is_alive()
+
+    children = [span for span in recorder.spans if span.operation_name == 'slow_task']
+    assert len(children) == 4
+    assert all(span.parent_id == parent.context.span_id for span in children)
@@ -0,0 +1,60 @@
+import os
+import threading
+
+import pytest
+
+from ext.ids import BufferedIdGenerator
+from ext.tracer import DebugTracer
+
+from tests.utils import ListRecorder
+
+
+def test_buffered_ids_are_unique_across_threads():
+    generator = BufferedIdGenerator(buffer_size=16)
+    ids = []
+
+    def generate():
+        ids.extend(generator.generate_id() for _ in range(100))
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 400
+    assert all(0 < i < 2 ** 64 for i in ids)
+
+
+def test_reseed_discards_buffered_ids():
+    generator = BufferedIdGenerator(buffer_size=16)
+    generator.generate_id()
+    buffered = list(generator._locals.ids)
+    generator.reseed()
+    assert generator.generate_id() not in buffered
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='requires Python 3.7+')
+def test_child_process_does_not_reuse_parent_ids():
+    generator = BufferedIdGenerator(buffer_size=16)
+    generator.generate_id()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, str(generator.generate_id()).encode())
+        os._exit(0)
+
+    os.waitpid(pid, 0)
+    child_id = int(os.read(read, 64))
+    os.close(read)
+    os.close(write)
+    assert child_id != generator.generate_id()
+
+
+def test_tracer_uses_the_id_generator():
+    generator = BufferedIdGenerator(buffer_size=4)
+    tracer = DebugTracer(recorder=ListRecorder(), id_generator=generator)
+    expected = list(reversed(generator._refill()))
+    with tracer.start_span('request') as root:
+        child = tracer.start_span('db.query', child_of=root)
+    assert [root.context.trace_id, root.context.span_id, child.context.span_id] == expected[:3]
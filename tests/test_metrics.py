@@ -0,0 +1,39 @@
+import threading
+
+from ext.tracer import DebugTracer
+from ext.metrics import MetricsRecorder, OTHER_OPERATIONS
+
+
+def record_in_threads(tracer, threads, operation_name):
+    for i in range(threads):
+        t = threading.Thread(target=lambda: tracer.start_span(operation_name(i)).finish())
+        t.start()
+        t.join()
+
+
+def test_dead_thread_shards_are_folded():
+    recorder = MetricsRecorder()
+    tracer = DebugTracer(recorder=recorder)
+
+    record_in_threads(tracer, 100, lambda i: 'request')
+    # shards of finished threads are folded when a new thread registers
+    assert len(recorder._shards) <= 1
+
+    snapshot = recorder.snapshot()
+    assert recorder._shards == []
+    assert snapshot['request']['count'] == 100
+
+    record_in_threads(tracer, 10, lambda i: 'request')
+    assert recorder.export()['request']['count'] == 110
+    assert recorder.export() == {}
+
+
+def test_folded_operations_are_bounded():
+    recorder = MetricsRecorder(max_operations=10)
+    tracer = DebugTracer(recorder=recorder)
+
+    record_in_threads(tracer, 50, lambda i: 'operation-%d' % i)
+    snapshot = recorder.snapshot()
+    assert len(snapshot) == 11
+    assert snapshot[OTHER_OPERATIONS]['count'] == 40
+    assert sum(metrics['count'] for metrics in snapshot.values()) == 50
@@ -0,0 +1,118 @@
+import io
+import threading
+
+import pytest
+
+from ext import tracer
+from ext.pool import SpanPool
+from ext.tracer import DebugTracer
+from ext.metrics import MetricsRecorder
+from ext.recorder import BatchingRecorder
+from ext.trace_store import TraceStore
+from ext.helpers import TracedThread, TracedGreenlet, TracedThreadPoolExecutor
+from ext.active_span_source import ThreadActiveSpanSource, GeventActiveSpanSource
+
+from tests.utils import ListRecorder
+
+
+class IdRecorder(ListRecorder):
+    def record_span(self, span):
+        # keep only what's needed, so that spans can be recycled
+        self.spans.append((span.operation_name, span.context.span_id, span.parent_id))
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = IdRecorder()
+    monkeypatch.setattr(tracer, 'recorder', recorder)
+    monkeypatch.setattr(tracer, 'span_pool', SpanPool())
+    monkeypatch.setattr(tracer, '_active_span_source', ThreadActiveSpanSource())
+    return recorder
+
+
+def start_thread(fn):
+    thread = TracedThread(target=fn)
+    return thread.start, thread.join
+
+
+def start_greenlet(fn):
+    greenlet = TracedGreenlet(fn)
+    return greenlet.start, greenlet.join
+
+
+def start_executor(fn):
+    executor = TracedThreadPoolExecutor(max_workers=1)
+    started = threading.Event()
+
+    def task():
+        started.wait()
+        fn()
+
+    future = executor.submit(task)
+
+    def join():
+        future.result()
+        executor.shutdown()
+    return started.set, join
+
+
+@pytest.mark.parametrize('capture', [start_thread, start_greenlet, start_executor])
+def test_captured_span_is_not_recycled(recorder, monkeypatch, capture):
+    if capture is start_greenlet:
+        monkeypatch.setattr(tracer, '_active_span_source', GeventActiveSpanSource())
+
+    def child():
+        tracer.start_active_span('child').finish()
+
+    parent = tracer.start_active_span('parent')
+    parent_id = parent.context.span_id
+    start, join = capture(child)
+
+    # the parent is finished before the child starts, and a new span
+    # would reuse it if it was released to the pool
+    parent.finish()
+    tracer.start_active_span('other').finish()
+    start()
+    join()
+
+    spans = {name: (span_id, parent_id) for name, span_id, parent_id in recorder.spans}
+    assert spans['child'][1] == parent_id
+    assert spans['other'][1] is None
+
+
+@pytest.mark.parametrize('release', [False, True])
+def test_batching_recorder_with_pool(capsys, release):
+    pool = SpanPool()
+    stream = io.StringIO()
+    recorder = BatchingRecorder(stream=stream, flush_interval=60,
+                                release=pool.release_shared if release else None)
+    tracer = DebugTracer(recorder=MetricsRecorder(recorder), span_pool=pool)
+
+    spans = [tracer.start_span('first-%d' % i) for i in range(3)]
+    for span in spans:
+        span.finish()
+    recorder.flush()
+
+    assert recorder.failed_spans == 0
+    assert recorder.flushed_spans == 3
+    assert capsys.readouterr().err == ''
+    assert all('first-%d' % i in stream.getvalue() for i in range(3))
+
+    # written spans are recycled only when the recorder releases them
+    recycled = tracer.start_span('second') in spans
+    assert recycled == release
+    recorder.close()
+
+
+def test_stored_spans_are_not_recycled():
+    pool = SpanPool()
+    store = TraceStore()
+    tracer = DebugTracer(recorder=store, span_pool=pool)
+
+    with tracer.start_span('stored') as span:
+        span.set_tag('key', 'value')
+    other = tracer.start_span('other')
+
+    assert other is not span
+    assert span.operation_name == 'stored'
+    assert span.tags == {'key': 'value'}
@@ -0,0 +1,142 @@
+import gc
+import time
+import weakref
+
+from ext.tracer import DebugTracer
+from ext.recorder import BatchingRecorder, TailSamplingRecorder
+from ext.sampler import ErrorTraceRule
+from ext.encoding import SpanEncoder, SpanDecoder
+
+from tests.utils import ListRecorder, BrokenStream, BrokenBytesStream
+
+
+def test_write_errors_keep_the_worker_alive(capsys):
+    stream = BrokenStream(failures=1)
+    recorder = BatchingRecorder(stream=stream, flush_interval=60)
+    tracer = DebugTracer(recorder=recorder)
+
+    tracer.start_span('lost').finish()
+    recorder.flush()
+    assert recorder.failed_spans == 1
+    assert 'failed to write 1 spans' in capsys.readouterr().err
+
+    tracer.start_span('written').finish()
+    recorder.close()
+    assert recorder.flushed_spans == 1
+    assert 'written' in stream.getvalue()
+    assert 'lost' not in stream.getvalue()
+
+
+def test_write_errors_in_the_worker_thread(capsys):
+    stream = BrokenStream(failures=1)
+    recorder = BatchingRecorder(stream=stream, max_batch_size=1, flush_interval=0.01)
+    tracer = DebugTracer(recorder=recorder)
+
+    tracer.start_span('lost').finish()
+    while not recorder.failed_spans:
+        recorder._worker.join(0.01)
+    tracer.start_span('written').finish()
+    recorder.close()
+
+    assert recorder.failed_spans == 1
+    assert recorder.flushed_spans == 1
+    assert 'written' in stream.getvalue()
+
+
+def test_encoder_is_reset_after_a_write_error(capsys):
+    stream = BrokenBytesStream(failures=1)
+    recorder = BatchingRecorder(stream=stream, flush_interval=60, encoder=SpanEncoder())
+    tracer = DebugTracer(recorder=recorder)
+
+    tracer.start_span('request').finish()
+    recorder.flush()
+    tracer.start_span('request').finish()
+    recorder.close()
+
+    # the interned operation name of the failed batch is written again
+    spans = list(SpanDecoder().feed(stream.getvalue()))
+    assert [span.operation_name for span in spans] == ['request']
+
+
+def test_closed_recorder_can_be_collected():
+    recorder = BatchingRecorder(stream=BrokenStream(failures=0), flush_interval=60)
+    DebugTracer(recorder=recorder).start_span('request').finish()
+    recorder.close()
+
+    ref = weakref.ref(recorder)
+    del recorder
+    gc.collect()
+    assert ref() is None
+
+
+def test_expired_traces_are_evicted_on_flush():
+    downstream = ListRecorder()
+    recorder = TailSamplingRecorder(downstream, [ErrorTraceRule()], max_age=0.01)
+    tracer = DebugTracer(recorder=recorder)
+
+    # the root of the trace is never finished
+    root = tracer.start_span('request')
+    tracer.start_span('db.query', child_of=root).finish()
+    recorder.flush()
+    assert recorder.buffered_spans == 1
+
+    time.sleep(0.02)
+    recorder.flush()
+    assert recorder.buffered_spans == 0
+    assert recorder.evicted_traces == 1
+    assert recorder.evicted_spans == 1
+    assert downstream.spans == []
+
+
+def test_buffered_traces_are_evicted_on_close():
+    downstream = ListRecorder()
+    recorder = TailSamplingRecorder(downstream, [ErrorTraceRule()])
+    tracer = DebugTracer(recorder=recorder)
+
+    for _ in range(3):
+        root = tracer.start_span('request')
+        tracer.start_span('db.query', child_of=root).finish()
+    recorder.close()
+    assert recorder.buffered_spans == 0
+    assert recorder.evicted_traces == 3
+    assert downstream.spans == []
+
+
+def test_tail_sampling_keeps_whole_traces():
+    downstream = ListRecorder()
+    recorder = TailSamplingRecorder(downstream, [ErrorTraceRule()])
+    tracer = DebugTracer(recorder=recorder)
+
+    with tracer.start_span('ok') as ok:
+        tracer.start_span('db.query', child_of=ok).finish()
+        ok_late = tracer.start_span('cache.query', child_of=ok)
+    with tracer.start_span('failed') as failed:
+        tracer.start_span('db.query', child_of=failed).set_tag('error', True).finish()
+        failed_late = tracer.start_span('cache.query', child_of=failed)
+    assert [span.operation_name for span in downstream.spans] == ['db.query', 'failed']
+    assert (recorder.kept_traces, recorder.dropped_traces) == (1, 1)
+    assert recorder.buffered_spans == 0
+
+    # spans finished after the root follow the decision of their trace
+    ok_late.finish()
+    failed_late.finish()
+    assert [span.operation_name for span in downstream.spans] == ['db.query', 'failed', 'cache.query']
+    assert downstream.spans[-1] is failed_late
+
+
+def test_tail_sampling_evicts_oldest_traces():
+    downstream = ListRecorder()
+    recorder = TailSamplingRecorder(downstream, [ErrorTraceRule()], max_spans=2)
+    tracer = DebugTracer(recorder=recorder)
+
+    roots = [tracer.start_span('request') for _ in range(3)]
+    for root in roots:
+        tracer.start_span('db.query', child_of=root).set_tag('error', True).finish()
+    assert recorder.buffered_spans == 2
+    assert (recorder.evicted_traces, recorder.evicted_spans) == (1, 1)
+
+    # the evicted trace has lost its children
+    for root in roots:
+        root.finish()
+    assert [span.operation_name for span in downstream.spans] == [
+        'db.query', 'request', 'db.query', 'request']
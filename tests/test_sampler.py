@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from ext import clock
+from ext.metrics import OTHER_OPERATIONS
+from ext.sampler import AdaptiveSampler
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.ns = 1000 * 1000000000
+
+    def now(self):
+        return self.ns
+
+    def sleep(self, seconds):
+        self.ns += int(seconds * 1000000000)
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(clock, 'now', fake.now)
+    return fake
+
+
+rng = random.Random(42)
+
+
+def run(sampler, fake_clock, rates, seconds):
+    """Calls the sampler for `seconds` with the given operations rates,
+    returning how many traces were sampled in each second.
+    """
+    sampled = []
+    for _ in range(seconds):
+        calls = [(i / rate, name) for name, rate in rates.items() for i in range(rate)]
+        calls.sort()
+        start = fake_clock.ns
+        count = 0
+        for offset, name in calls:
+            fake_clock.ns = start + int(offset * 1000000000)
+            count += sampler.sampled(rng.getrandbits(64), name)
+        fake_clock.ns = start + 1000000000
+        sampled.append(count)
+    return sampled
+
+
+def test_warm_up_is_bounded_by_target(fake_clock):
+    sampler = AdaptiveSampler(10, min_traces_per_second=None)
+    first_second = run(sampler, fake_clock, {'hot': 10000}, 1)[0]
+    assert first_second <= 11
+
+
+def test_operations_warming_up_share_the_target(fake_clock):
+    sampler = AdaptiveSampler(10, min_traces_per_second=None)
+    first_second = run(sampler, fake_clock, {'hot': 2000, 'warm': 100, 'rare': 2}, 1)[0]
+    assert first_second <= 12
+
+
+def test_new_operation_gets_its_share(fake_clock):
+    sampler = AdaptiveSampler(10, min_traces_per_second=None)
+    run(sampler, fake_clock, {'hot': 1000}, 5)
+    per_second = run(sampler, fake_clock, {'hot': 1000, 'new': 1000}, 1)[0]
+    assert per_second <= 17
+
+
+def test_converges_to_target(fake_clock):
+    sampler = AdaptiveSampler(10, min_traces_per_second=None)
+    per_second = run(sampler, fake_clock, {'hot': 2000, 'warm': 100, 'rare': 2}, 30)
+    assert 8 <= sum(per_second[:10]) / 10.0 <= 12
+    assert 8 <= sum(per_second[10:]) / 20.0 <= 12
+    assert sampler.probabilities()['rare'] == 1.0
+
+
+def test_idle_operations_are_evicted(fake_clock):
+    sampler = AdaptiveSampler(10, max_operations=2, idle_windows=1)
+    run(sampler, fake_clock, {'a': 10, 'b': 10}, 2)
+    run(sampler, fake_clock, {'c': 10}, 2)
+    assert set(sampler.probabilities()) == {'a', 'b', OTHER_OPERATIONS}
+
+    run(sampler, fake_clock, {'a': 10}, 11)
+    run(sampler, fake_clock, {'c': 10}, 1)
+    assert set(sampler.probabilities()) == {'a', 'c'}
+
+
+def test_rare_operations_get_all_their_traces(fake_clock):
+    sampler = AdaptiveSampler(10, min_traces_per_second=0.5)
+    run(sampler, fake_clock, {'hot': 10000}, 5)
+    # the hot operation takes the whole target
+    sampled = run(sampler, fake_clock, {'hot': 10000, 'rare': 1}, 10)
+    assert 90 <= sum(sampled) <= 115
+    assert sampler.probabilities()['rare'] == 1.0
+
+
+def test_min_traces_per_second(fake_clock):
+    # a probability so low that only the floor keeps sampling traces
+    sampler = AdaptiveSampler(0.001, min_traces_per_second=0.5)
+    sampled = run(sampler, fake_clock, {'hot': 100}, 20)
+    assert sum(sampled[2:]) == 9
+
+
+def test_operations_over_the_limit_share_a_state(fake_clock):
+    sampler = AdaptiveSampler(10, max_operations=2)
+    run(sampler, fake_clock, {'a': 10, 'b': 10, 'c': 10, 'd': 10}, 2)
+    assert set(sampler.probabilities()) == {'a', 'b', OTHER_OPERATIONS}
@@ -0,0 +1,79 @@
+from opentracing import Format
+from basictracer.text_propagator import TextPropagator
+
+from ext.ids import RandomIdGenerator
+from ext.tracer import DebugTracer
+from ext.sampler import ConstSampler
+from ext.span import NonRecordingSpan
+from ext.active_span_source import ThreadActiveSpanSource
+
+from tests.utils import ListRecorder
+
+
+def test_unsampled_baggage_reaches_children_and_carrier():
+    recorder = ListRecorder()
+    tracer = DebugTracer(recorder=recorder, sampler=ConstSampler(False))
+    tracer.register_propagator(Format.TEXT_MAP, TextPropagator())
+
+    root = tracer.start_span('request')
+    assert isinstance(root, NonRecordingSpan)
+    root.set_baggage_item('user', 'alice')
+    assert root.get_baggage_item('user') == 'alice'
+
+    child = tracer.start_span('db.query', child_of=root)
+    assert child.get_baggage_item('user') == 'alice'
+    child.set_baggage_item('shard', '3')
+    assert root.get_baggage_item('shard') is None
+
+    carrier = {}
+    tracer.inject(child.context, Format.TEXT_MAP, carrier)
+    extracted = tracer.extract(Format.TEXT_MAP, carrier)
+    assert extracted.baggage == {'user': 'alice', 'shard': '3'}
+    assert extracted.trace_id == root.context.trace_id
+    assert not extracted.sampled
+
+    child.finish()
+    root.finish()
+    assert recorder.spans == []
+
+
+def test_unsampled_baggage_with_active_spans():
+    tracer = DebugTracer(recorder=ListRecorder(), sampler=ConstSampler(False))
+    tracer._active_span_source = ThreadActiveSpanSource()
+
+    with tracer.start_active_span('request') as root:
+        root.set_baggage_item('user', 'alice')
+        with tracer.start_active_span('db.query') as child:
+            assert child.get_baggage_item('user') == 'alice'
+
+
+class CountingIdGenerator(RandomIdGenerator):
+    def __init__(self):
+        self.generated = 0
+
+    def generate_id(self):
+        self.generated += 1
+        return super(CountingIdGenerator, self).generate_id()
+
+
+def test_unsampled_children_share_the_root_context():
+    ids = CountingIdGenerator()
+    tracer = DebugTracer(recorder=ListRecorder(), sampler=ConstSampler(False), id_generator=ids)
+    tracer._active_span_source = ThreadActiveSpanSource()
+
+    with tracer.start_active_span('request') as root:
+        with tracer.start_active_span('db.query') as child:
+            with tracer.start_active_span('db.connect') as grandchild:
+                assert tracer.active_span is grandchild
+            assert tracer.active_span is child
+            manual = tracer.start_manual_span('cache.query', child_of=child)
+            manual.finish()
+            assert tracer.active_span is child
+        assert tracer.active_span is root
+    assert tracer.active_span is None
+
+    # only the trace id of the root span is generated
+    assert ids.generated == 1
+    assert child.context is root.context
+    assert grandchild.context is root.context
+    assert manual.context is root.context
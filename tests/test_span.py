@@ -0,0 +1,79 @@
+import types
+import collections
+
+import pytest
+
+from ext.tracer import DebugTracer
+from ext.span import Span, CompactSpan
+from ext.active_span_source import ThreadActiveSpanSource
+
+from tests.utils import ListRecorder
+
+
+@pytest.mark.parametrize('span_class', [Span, CompactSpan])
+@pytest.mark.parametrize('mapping', [
+    collections.OrderedDict,
+    type('TagsDict', (dict,), {}),
+    lambda **kwargs: types.MappingProxyType(kwargs),
+])
+def test_tags_from_any_mapping(span_class, mapping):
+    tracer = DebugTracer(span_class=span_class)
+    tags = mapping(url='/home', status=200)
+
+    span = tracer.start_span('request', tags=tags)
+    assert span.tags == {'url': '/home', 'status': 200}
+    span.set_tag('error', True)
+    span.set_tag('status', 500)
+    assert span.tags == {'url': '/home', 'status': 500, 'error': True}
+
+
+@pytest.mark.parametrize('span_class', [Span, CompactSpan])
+def test_buffered_tags_and_logs(span_class):
+    tracer = DebugTracer(span_class=span_class)
+
+    span = tracer.start_span('request')
+    span.set_tag('url', '/home')
+    span.set_tag('url', '/about')
+    span.log_kv({'event': 'cache.miss'})
+    assert span.tags == {'url': '/about'}
+    assert [log.key_values for log in span.logs] == [{'event': 'cache.miss'}]
+
+    # materialized containers are updated in place
+    span.set_tag('status', 200)
+    span.log_kv({'event': 'done'})
+    assert span.tags == {'url': '/about', 'status': 200}
+    assert [log.key_values['event'] for log in span.logs] == ['cache.miss', 'done']
+
+
+def test_compact_span_lifecycle():
+    recorder = ListRecorder()
+    tracer = DebugTracer(recorder=recorder, span_class=CompactSpan)
+    tracer._active_span_source = ThreadActiveSpanSource()
+
+    with pytest.raises(ValueError):
+        with tracer.start_active_span('request') as span:
+            assert not hasattr(span, '__dict__')
+            span.set_operation_name('GET /home')
+            span.set_baggage_item('user', 'alice')
+            with tracer.start_active_span('db.query') as child:
+                assert child.parent_id == span.context.span_id
+                assert child.get_baggage_item('user') == 'alice'
+            raise ValueError('boom')
+
+    assert recorder.spans == [child, span]
+    assert span.operation_name == 'GET /home'
+    assert span.duration_ns >= child.duration_ns >= 0
+    assert [log.key_values['python.exception.type'] for log in span.logs] == [ValueError]
+    assert tracer.active_span is None
+
+
+def test_compact_span_empty_containers_are_not_shared():
+    tracer = DebugTracer(recorder=ListRecorder(), span_class=CompactSpan)
+    first = tracer.start_span('first')
+    second = tracer.start_span('second')
+    assert first.tags == {} and first.logs == ()
+
+    first.set_tag('url', '/home')
+    first.log_kv({'event': 'done'})
+    assert second.tags == {}
+    assert second.logs == ()
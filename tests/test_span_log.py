@@ -0,0 +1,23 @@
+from ext.tracer import DebugTracer
+from ext.span_log import SegmentLogRecorder, SegmentLogReader
+
+
+def test_oversized_span_is_dropped(tmp_path, capsys):
+    recorder = SegmentLogRecorder(str(tmp_path), segment_size=512, compress=False)
+    tracer = DebugTracer(recorder=recorder)
+
+    tracer.start_span('before', tags={'url': '/home'}).finish()
+    # interns new strings in the current segment before it's dropped
+    tracer.start_span('oversized', tags={'payload': 'x' * 1024}).finish()
+    for i in range(20):
+        tracer.start_span('after', tags={'url': '/home', 'payload': i}).finish()
+    tracer.start_span('oversized', tags={'payload': 'x' * 1024}).finish()
+    recorder.close()
+
+    assert recorder.dropped_spans == 2
+    assert capsys.readouterr().err.count('larger than segment_size') == 1
+
+    spans = list(SegmentLogReader(str(tmp_path)).spans())
+    assert [span.operation_name for span in spans] == ['before'] + ['after'] * 20
+    assert [span.tags['payload'] for span in spans[1:]] == list(range(20))
+    assert all(span.tags['url'] == '/home' for span in spans)
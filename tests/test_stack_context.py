@@ -0,0 +1,44 @@
+import pytest
+
+stack_context = pytest.importorskip('tornado.stack_context')
+
+from ext.tornado.stack_context import TracerStackContext  # noqa: E402
+
+
+def test_current_data_of_nested_contexts():
+    assert TracerStackContext.current_data() is None
+
+    with TracerStackContext() as outer:
+        assert TracerStackContext.current_data() is outer.data
+        with TracerStackContext() as inner:
+            assert TracerStackContext.current_data() is inner.data
+            inner.deactivate()
+            assert TracerStackContext.current_data() is outer.data
+        assert TracerStackContext.current_data() is outer.data
+
+        with stack_context.NullContext():
+            assert TracerStackContext.current_data() is None
+        assert TracerStackContext.current_data() is outer.data
+    assert TracerStackContext.current_data() is None
+
+
+def test_wrapped_callbacks_restore_their_context():
+    seen = []
+
+    def callback():
+        seen.append(TracerStackContext.current_data())
+
+    with TracerStackContext() as outer:
+        outer_callback = stack_context.wrap(callback)
+        with TracerStackContext() as inner:
+            inner_callback = stack_context.wrap(callback)
+
+    inner_callback()
+    outer_callback()
+    with TracerStackContext() as other:
+        # callbacks run in their own stack, not in the caller one
+        inner_callback()
+        assert TracerStackContext.current_data() is other.data
+    callback()
+
+    assert seen == [inner.data, outer.data, inner.data, None]
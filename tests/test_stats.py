@@ -0,0 +1,96 @@
+import io
+import time
+import asyncio
+
+import pytest
+
+from ext import helpers
+from ext.stats import Stage
+from ext.reaper import SpanReaper
+from ext.active_span_source import AsyncioActiveSpanSource
+
+from tests.utils import ListRecorder
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    # `helpers.ensure_future()` uses the global tracer
+    tracer = helpers.tracer
+    monkeypatch.setattr(tracer, 'recorder', ListRecorder())
+    monkeypatch.setattr(tracer, '_active_span_source', AsyncioActiveSpanSource())
+    tracer.enable_stats()
+    yield tracer
+    tracer.disable_stats()
+
+
+def test_stages_are_timed(tracer):
+    with tracer.start_active_span('parent'):
+        tracer.start_active_span('child').finish()
+
+    stats = tracer.stats()
+    for stage in ('start_active_span', 'finish', 'make_active', 'deactivate',
+                  'active_span', 'generate_id', 'record_span'):
+        assert stats[stage]['calls'] >= 2
+        assert stats[stage]['total_ns'] > 0
+    assert [span.operation_name for span in tracer.recorder.spans] == ['child', 'parent']
+
+
+def test_instrumented_components_keep_their_type(tracer):
+    source = tracer.active_span_source
+    assert type(source).__name__ == 'AsyncioActiveSpanSource'
+    assert isinstance(source, AsyncioActiveSpanSource)
+    assert isinstance(tracer.recorder, ListRecorder)
+
+    reaper = SpanReaper([source], max_age=0)
+    with tracer.start_active_span('parent'):
+        assert reaper.live_spans() == {'AsyncioActiveSpanSource': 1}
+    assert reaper.live_spans() == {'AsyncioActiveSpanSource': 0}
+
+    tracer.disable_stats()
+    assert type(source) is AsyncioActiveSpanSource
+    assert type(tracer.recorder) is ListRecorder
+
+
+def test_tasks_inherit_the_active_span(tracer):
+    async def child():
+        return tracer.start_active_span('child')
+
+    loop = asyncio.new_event_loop()
+    with tracer.start_active_span('parent') as parent:
+        task = helpers.ensure_future(child(), loop=loop)
+    loop.run_until_complete(task)
+    loop.close()
+
+    assert task.result().parent_id == parent.context.span_id
+
+
+def test_stage_percentiles_of_latest_calls():
+    stage = Stage(reservoir_size=10)
+    for elapsed in range(1, 101):
+        stage.add(elapsed)
+    assert stage.snapshot() == {'calls': 100, 'total_ns': 5050, 'p50_ns': 96, 'p99_ns': 100}
+    assert Stage(10).snapshot()['p99_ns'] == 0
+
+
+def test_stats_are_kept_after_disable(tracer):
+    tracer.start_active_span('request').finish()
+    calls = tracer.stats()['finish']['calls']
+    tracer.disable_stats()
+    tracer.start_active_span('request').finish()
+    assert tracer.stats()['finish']['calls'] == calls > 0
+    assert 'start_active_span' not in vars(tracer)
+
+
+def test_stats_dump(tracer):
+    stream = io.StringIO()
+    tracer.enable_stats(dump_interval=0.01, stream=stream)
+    tracer.start_active_span('request').finish()
+    deadline = time.monotonic() + 5
+    while 'record_span' not in stream.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    tracer.disable_stats()
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0].split() == ['stage', 'calls', 'total_ns', 'p50_ns', 'p99_ns']
+    assert any(line.split()[0] == 'record_span' for line in lines)
+    assert tracer._stats._dumper is None
@@ -0,0 +1,73 @@
+import pytest
+
+tornado = pytest.importorskip('tornado')
+if tornado.version_info < (5,):
+    pytest.skip('requires the asyncio-based IOLoop of Tornado 5+', allow_module_level=True)
+
+from tornado import gen  # noqa: E402
+from tornado.ioloop import IOLoop  # noqa: E402
+
+from ext.tracer import DebugTracer  # noqa: E402
+from ext.tornado.context import spawn_callback  # noqa: E402
+from ext.active_span_source import TornadoContextVarActiveSpanSource  # noqa: E402
+
+from tests.utils import ListRecorder  # noqa: E402
+
+
+@pytest.fixture
+def tracer():
+    tracer = DebugTracer(recorder=ListRecorder())
+    tracer._active_span_source = TornadoContextVarActiveSpanSource()
+    return tracer
+
+
+@pytest.fixture
+def run_sync():
+    loop = IOLoop()
+    yield loop.run_sync
+    loop.close()
+
+
+def test_coroutines_inherit_the_active_span(tracer, run_sync):
+    parents = []
+
+    @gen.coroutine
+    def child():
+        yield gen.moment
+        with tracer.start_active_span('child') as span:
+            parents.append(span.parent_id)
+
+    async def native_child():
+        await gen.sleep(0)
+        with tracer.start_active_span('native_child') as span:
+            parents.append(span.parent_id)
+
+    @gen.coroutine
+    def entrypoint():
+        with tracer.start_active_span('parent') as parent:
+            yield [child(), native_child(), child()]
+            assert tracer.active_span is parent
+        return parent
+
+    parent = run_sync(entrypoint)
+    assert parents == [parent.context.span_id] * 3
+    assert tracer.active_span is None
+
+
+def test_callbacks_inherit_the_active_span(tracer, run_sync):
+    seen = []
+
+    def callback():
+        seen.append(tracer.active_span)
+
+    @gen.coroutine
+    def entrypoint():
+        with tracer.start_active_span('parent') as parent:
+            IOLoop.current().add_callback(callback)
+            spawn_callback(callback)
+        yield gen.sleep(0.01)
+        return parent
+
+    parent = run_sync(entrypoint)
+    # spawned callbacks don't inherit it
+    assert seen == [parent, None]
@@ -0,0 +1,67 @@
+from ext.tracer import DebugTracer
+from ext.trace_store import TraceStore
+
+
+def record_trace(tracer, durations, tags=None):
+    """Records a root `request` span, with a `db.query` child for each
+    given duration; the root lasts as long as all its children.
+    """
+    start = 1000.0
+    root = tracer.start_span('request', start_time=start, tags=tags)
+    for duration in durations:
+        child = tracer.start_span('db.query', child_of=root, start_time=start)
+        child.finish(finish_time=start + duration)
+        start += duration
+    root.finish(finish_time=start)
+    return root
+
+
+def test_queries():
+    store = TraceStore()
+    tracer = DebugTracer(recorder=store)
+    fast = record_trace(tracer, [0.1, 0.2], tags={'status': 200, 'ids': [1, 2]})
+    slow = record_trace(tracer, [1.0, 3.0], tags={'status': 500})
+    assert len(store) == 6
+
+    root, = store.get_trace(slow.context.trace_id)
+    assert root.span is slow
+    assert [child.span.duration for child in root.children] == [
+        span.duration for span in store.find_by_operation('db.query')[2:]]
+    assert [span.operation_name for span in root.walk()] == ['request', 'db.query', 'db.query']
+    assert set(store.get_traces([fast, slow])) == {fast.context.trace_id, slow.context.trace_id}
+    assert store.get_trace(0) == []
+
+    assert store.find_by_tag('status', 500) == [slow]
+    # not hashable tags are not indexed
+    assert store.find_by_tag('ids', (1, 2)) == []
+
+    queries = store.find_by_duration(min_duration=0.5, operation_name='db.query')
+    assert [span.operation_name for span in queries] == ['db.query'] * 2
+    assert queries[0].duration < queries[1].duration
+    assert store.find_by_duration(min_duration=0.5, max_duration=2.0) == [queries[0]]
+    assert store.slowest(2) == [slow, queries[1]]
+    assert store.slowest(1, operation_name='request') == [slow]
+    assert store.slowest(0) == []
+
+
+def test_oldest_spans_are_evicted():
+    store = TraceStore(max_spans=2)
+    tracer = DebugTracer(recorder=store)
+    first = record_trace(tracer, [0.1], tags={'status': 200})
+    second = record_trace(tracer, [0.2, 0.3], tags={'status': 200})
+    assert len(store) == 2
+
+    # the first trace is gone, and the first child of the second one too
+    assert store.get_trace(first.context.trace_id) == []
+    assert store.find_by_tag('status', 200) == [second]
+    assert len(store.find_by_operation('db.query')) == 1
+    assert store.slowest(10)[0] is second
+    assert len(store.find_by_duration()) == 2
+    root, = store.get_trace(second.context.trace_id)
+    assert len(root.children) == 1
+
+    # a span whose parent is not in the store is a root
+    parent = tracer.start_span('request')
+    child = tracer.start_span('db.query', child_of=parent)
+    child.finish()
+    assert [root.span for root in store.get_trace(parent.context.trace_id)] == [child]
@@ -0,0 +1,31 @@
+import io
+
+
+class ListRecorder(object):
+    """Recorder that keeps all the recorded spans"""
+    def __init__(self):
+        self.spans = []
+
+    def record_span(self, span):
+        self.spans.append(span)
+
+
+class Broken(object):
+    """Stream mixin that fails the first `failures` writes"""
+    def __init__(self, failures):
+        super(Broken, self).__init__()
+        self.failures = failures
+
+    def write(self, data):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('disk full')
+        return super(Broken, self).write(data)
+
+
+class BrokenStream(Broken, io.StringIO):
+    pass
+
+
+class BrokenBytesStream(Broken, io.BytesIO):
+    pass